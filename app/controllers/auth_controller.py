@@ -1,6 +1,8 @@
 from app.cores.database import users_collection, members_collection
 from app.schemas.auth_schema import UserRegister, UserLogin
 from app.utils.utils import hash_password, verify_password, create_access_token, generate_reset_token
+from app.utils.fuzzy_index import fuzzy_user_added
+from app.utils.query_compiler import SEARCH_KEYS, USER_SEARCH_FIELDS, search_keys
 from fastapi import HTTPException, status
 from datetime import datetime
 from bson import ObjectId
@@ -36,8 +38,10 @@ async def register_user(user_data: UserRegister):
         "is_active": True,
         "created_at": datetime.utcnow()
     }
+    user_doc[SEARCH_KEYS] = search_keys(user_doc, USER_SEARCH_FIELDS)
     
     result = await users_collection.insert_one(user_doc)
+    fuzzy_user_added(user_doc)
     
     return {
         "message": "User registered successfully",
@@ -1,80 +1,373 @@
 from app.cores.database import books_collection
-from app.schemas.book_schema import BookCreate, BookUpdate
+from app.schemas.book_schema import BookCreate, BookUpdate, BatchAvailabilityRequest, BOOK_EXPORT_FIELDS
 from app.cores.config import settings
+from app.utils.pagination import encode_cursor, seek_query, count_total, trim_page, total_pages
+from app.utils.facets import facet_changes, apply_facet_changes, list_facets
+from app.utils.utils import build_projection, with_text_score, json_default, TEXT_SCORE_SORT
+from app.utils.covers import save_cover
+from app.utils.book_cache import book_cache, get_cached_book
+from app.utils.search_index import index_book, unindex_book
+from app.utils.autocomplete import autocomplete_book_written, autocomplete_book_deleted
+from app.utils.fuzzy_index import fuzzy_book_clauses, fuzzy_book_written, fuzzy_book_deleted
+from app.utils.query_compiler import (
+    SEARCH_KEYS, BOOK_SEARCH_FIELDS, HIDDEN_FIELDS, search_keys, search_key_updates,
+    match_field, match_any, time_limited
+)
 from fastapi import HTTPException, status, UploadFile
 from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, OperationFailure
+from pydantic import ValidationError
 from datetime import datetime
 from typing import Optional
-import shutil
-import os
+import json
+import csv
+import io
 
-async def add_book(book: BookCreate):
-    """Add a new book to the library"""
-    # Check if ISBN already exists
-    existing_book = await books_collection.find_one({"isbn": book.isbn})
+def _after_book_write(book: dict, old_book: dict = None):
+    """Keep in-process caches and indexes in step with a written book"""
+    book_cache.invalidate(str(book["_id"]))
+    index_book(book, old_book)
+    autocomplete_book_written(book, old_book)
+    fuzzy_book_written(book, old_book)
+
+def _after_book_delete(book: dict):
+    """Drop a deleted book from in-process caches and indexes"""
+    book_id = str(book["_id"])
+    book_cache.invalidate(book_id)
+    unindex_book(book)
+    autocomplete_book_deleted(book)
+    fuzzy_book_deleted(book)
+
+async def _check_isbn_free(isbn: str):
+    """Reject an ISBN that another book already has"""
+    existing_book = await books_collection.find_one({"isbn": isbn}, {"_id": 1})
     if existing_book:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Book with this ISBN already exists"
         )
+
+async def add_book(book: BookCreate):
+    """Add a new book to the library"""
+    await _check_isbn_free(book.isbn)
     
+    now = datetime.utcnow()
     book_doc = {
         **book.model_dump(),
         "available_copies": book.total_copies,
-        "created_at": datetime.utcnow()
+        "version": 1,
+        "created_at": now,
+        "updated_at": now
     }
+    book_doc[SEARCH_KEYS] = search_keys(book_doc, BOOK_SEARCH_FIELDS)
     
     result = await books_collection.insert_one(book_doc)
+    await apply_facet_changes(facet_changes(book_doc))
+    _after_book_write(book_doc)
+    
     return {
         "message": "Book added successfully",
         "book_id": str(result.inserted_id)
     }
 
+async def iter_ndjson(chunks):
+    """Yield one decoded JSON value per line of an NDJSON byte stream
+    
+    Lines that are not valid JSON are yielded as the `ValueError` raised
+    while decoding them, so the caller can report them per row.
+    """
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield _decode_ndjson_line(line)
+    if buffer.strip():
+        yield _decode_ndjson_line(buffer)
+
+def _decode_ndjson_line(line: bytes):
+    try:
+        return json.loads(line)
+    except ValueError as e:
+        return e
+
+async def bulk_add_books(rows):
+    """Add many books at once from a list or async iterator of raw records
+    
+    Rows are validated as `BookCreate`, checked for existing ISBNs with one
+    `$in` lookup per batch and written with unordered `insert_many`.
+    Returns a per-row report.
+    """
+    results = []
+    batch = []
+    row_number = 0
+    
+    async for raw in _iter_rows(rows):
+        batch.append((row_number, raw))
+        row_number += 1
+        if len(batch) >= settings.BULK_BATCH_SIZE:
+            results.extend(await _insert_book_batch(batch))
+            batch = []
+    
+    if batch:
+        results.extend(await _insert_book_batch(batch))
+    
+    inserted = sum(1 for result in results if result["status"] == "created")
+    return {
+        "message": "Bulk import completed",
+        "total": len(results),
+        "inserted": inserted,
+        "failed": len(results) - inserted,
+        "results": results
+    }
+
+async def _iter_rows(rows):
+    """Iterate a plain list or an async iterator of rows the same way"""
+    if hasattr(rows, "__aiter__"):
+        async for raw in rows:
+            yield raw
+    else:
+        for raw in rows:
+            yield raw
+
+async def _insert_book_batch(batch: list):
+    """Validate, de-duplicate and insert one batch of raw book records"""
+    results = {}
+    candidates = []
+    seen_isbns = set()
+    
+    for row, raw in batch:
+        if isinstance(raw, Exception) or not isinstance(raw, dict):
+            results[row] = {"row": row, "status": "invalid", "error": "Row is not a JSON object"}
+            continue
+        try:
+            book = BookCreate.model_validate(raw)
+        except ValidationError as e:
+            results[row] = {"row": row, "status": "invalid", "error": e.errors(include_url=False)}
+            continue
+        
+        if book.isbn in seen_isbns:
+            results[row] = {"row": row, "status": "duplicate", "isbn": book.isbn, "error": "Duplicate ISBN in request"}
+            continue
+        seen_isbns.add(book.isbn)
+        candidates.append((row, book))
+    
+    # One lookup for every ISBN in the batch
+    existing_isbns = set()
+    if seen_isbns:
+        async for existing in books_collection.find({"isbn": {"$in": list(seen_isbns)}}, {"isbn": 1}):
+            existing_isbns.add(existing["isbn"])
+    
+    created_at = datetime.utcnow()
+    to_insert = []
+    for row, book in candidates:
+        if book.isbn in existing_isbns:
+            results[row] = {"row": row, "status": "duplicate", "isbn": book.isbn, "error": "Book with this ISBN already exists"}
+            continue
+        doc = {
+            **book.model_dump(),
+            "available_copies": book.total_copies,
+            "version": 1,
+            "created_at": created_at,
+            "updated_at": created_at
+        }
+        doc[SEARCH_KEYS] = search_keys(doc, BOOK_SEARCH_FIELDS)
+        to_insert.append((row, doc))
+    
+    failed_indexes = {}
+    if to_insert:
+        try:
+            await books_collection.insert_many([doc for _, doc in to_insert], ordered=False)
+        except BulkWriteError as e:
+            # Another writer may have inserted the same ISBN since the lookup
+            for error in e.details.get("writeErrors", []):
+                failed_indexes[error["index"]] = error
+    
+    inserted_docs = []
+    for index, (row, doc) in enumerate(to_insert):
+        error = failed_indexes.get(index)
+        if error is None:
+            inserted_docs.append(doc)
+            results[row] = {"row": row, "status": "created", "isbn": doc["isbn"], "book_id": str(doc["_id"])}
+        elif error.get("code") == 11000:
+            results[row] = {"row": row, "status": "duplicate", "isbn": doc["isbn"], "error": "Book with this ISBN already exists"}
+        else:
+            results[row] = {"row": row, "status": "failed", "isbn": doc["isbn"], "error": error.get("errmsg")}
+    
+    await apply_facet_changes([change for doc in inserted_docs for change in facet_changes(doc)])
+    for doc in inserted_docs:
+        _after_book_write(doc)
+    
+    return [results[row] for row, _ in batch]
+
+async def build_book_query(
+    category: Optional[str] = None,
+    author: Optional[str] = None,
+    search: Optional[str] = None,
+    search_mode: str = "regex"
+) -> dict:
+    """Build the catalog filter shared by listing and export
+    
+    `search_mode="text"` matches `search` against the books text index;
+    `fuzzy` matches titles and authors within trigram similarity of it
+    (tolerating typos); `prefix` matches the start of title, author or
+    category with an indexed range; `regex` keeps the (escaped) substring
+    match on title, author and description.
+    """
+    query = {}
+    if category:
+        query["category"] = category
+    if author:
+        query.update(match_field("author", author, search_mode))
+    if search and search_mode == "text":
+        query["$text"] = {"$search": search}
+    elif search and search_mode == "fuzzy":
+        query["$or"] = await fuzzy_book_clauses(search)
+    elif search and search_mode == "prefix":
+        query["$or"] = match_any(BOOK_SEARCH_FIELDS, search, search_mode)
+    elif search:
+        query["$or"] = match_any(["title", "author", "description"], search)
+    return query
+
 async def get_books(
     page: int = 1,
     page_size: int = None,
     category: Optional[str] = None,
     author: Optional[str] = None,
-    search: Optional[str] = None
+    search: Optional[str] = None,
+    cursor: Optional[str] = None,
+    count_strategy: str = "exact",
+    include_total: bool = True,
+    fields: Optional[str] = None,
+    search_mode: str = "regex"
 ):
-    """List books with pagination and filters"""
+    """List books with pagination and filters
+    
+    Passing `cursor` (an empty string for the first page) switches to keyset
+    pagination on `_id`, so deep pages cost the same as the first one.
+    `count_strategy` and `include_total` control how the total is computed,
+    and `fields` limits the returned fields (full documents by default).
+    With `search_mode="text"` page-mode results are ranked by text score.
+    """
     if page_size is None:
         page_size = settings.DEFAULT_PAGE_SIZE
     
     page_size = min(page_size, settings.MAX_PAGE_SIZE)
     skip = (page - 1) * page_size
     
-    # Build filter query
-    query = {}
-    if category:
-        query["category"] = category
-    if author:
-        query["author"] = {"$regex": author, "$options": "i"}
-    if search:
-        query["$or"] = [
-            {"title": {"$regex": search, "$options": "i"}},
-            {"author": {"$regex": search, "$options": "i"}},
-            {"description": {"$regex": search, "$options": "i"}}
-        ]
+    query = await build_book_query(category, author, search, search_mode)
+    text_search = "$text" in query
+    
+    projection = build_projection(fields)
+    if projection is not None:
+        # Needed for list ETags
+        projection["version"] = 1
+    else:
+        projection = dict(HIDDEN_FIELDS)
+    if text_search:
+        projection = with_text_score(projection)
+    
+    if cursor is not None:
+        return await _get_books_by_cursor(query, page_size, cursor, projection)
     
     # Get total count
-    total = await books_collection.count_documents(query)
+    total, count_used = await count_total(books_collection, query, count_strategy, include_total)
     
-    # Get paginated results
+    # Get paginated results (one extra row signals more pages when uncounted)
     books = []
-    cursor = books_collection.find(query).skip(skip).limit(page_size)
+    limit = page_size if total is not None else page_size + 1
+    cursor = time_limited(books_collection.find(query, projection))
+    if text_search:
+        cursor = cursor.sort(TEXT_SCORE_SORT)
+    cursor = cursor.skip(skip).limit(limit)
     async for book in cursor:
         book["id"] = str(book.pop("_id"))
         books.append(book)
     
+    books, has_more = trim_page(books, page_size, skip, total)
+    
     return {
         "books": books,
         "total": total,
         "page": page,
         "page_size": page_size,
-        "total_pages": (total + page_size - 1) // page_size
+        "total_pages": total_pages(total, page_size),
+        "has_more": has_more,
+        "count_strategy": count_used
+    }
+
+async def _get_books_by_cursor(query: dict, page_size: int, cursor: str, projection: dict = None):
+    """Fetch one page of books after the given cursor, ordered by `_id`"""
+    books = []
+    cursor_query = time_limited(books_collection.find(seek_query(query, cursor), projection)).sort("_id", 1).limit(page_size + 1)
+    async for book in cursor_query:
+        book["id"] = str(book.pop("_id"))
+        books.append(book)
+    
+    has_more = len(books) > page_size
+    books = books[:page_size]
+    
+    return {
+        "books": books,
+        "page_size": page_size,
+        "next_cursor": encode_cursor(books[-1]["id"]) if has_more else None,
+        "has_more": has_more
     }
 
+async def open_book_export(query: dict, projection: Optional[dict] = None) -> tuple:
+    """Start the export query and read its first batch
+    
+    Runs before the response starts streaming, so a query the server
+    rejects is reported as a 400 rather than a 200 body cut short.
+    """
+    cursor = books_collection.find(query, projection or HIDDEN_FIELDS).sort("_id", 1).batch_size(settings.EXPORT_BATCH_SIZE)
+    try:
+        first_batch = await cursor.to_list(length=settings.EXPORT_BATCH_SIZE)
+    except OperationFailure as error:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid export query: {(error.details or {}).get('errmsg', str(error))}"
+        )
+    return cursor, first_batch
+
+async def export_books(cursor, first_batch: list, projection: Optional[dict] = None, export_format: str = "ndjson"):
+    """Stream the catalog as NDJSON or CSV chunks straight from a cursor
+    
+    Documents are read in batches of EXPORT_BATCH_SIZE and written out as
+    they arrive, so memory use does not grow with the catalog size.
+    """
+    async def documents():
+        for book in first_batch:
+            yield book
+        async for book in cursor:
+            yield book
+    
+    buffer = io.StringIO()
+    if export_format == "csv":
+        columns = ["id"] + [name for name in (projection or BOOK_EXPORT_FIELDS) if name != "_id"]
+        writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore")
+        writer.writeheader()
+    
+    rows = 0
+    async for book in documents():
+        book["id"] = str(book.pop("_id"))
+        if export_format == "csv":
+            writer.writerow(book)
+        else:
+            buffer.write(json.dumps(book, default=json_default))
+            buffer.write("\n")
+        
+        rows += 1
+        if rows % settings.EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    
+    if buffer.tell():
+        yield buffer.getvalue()
+
 async def get_book_by_id(book_id: str):
     """Get a single book by ID"""
     if not ObjectId.is_valid(book_id):
@@ -83,7 +376,7 @@ async def get_book_by_id(book_id: str):
             detail="Invalid book ID"
         )
     
-    book = await books_collection.find_one({"_id": ObjectId(book_id)})
+    book = await get_cached_book(book_id)
     if not book:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -110,17 +403,30 @@ async def update_book(book_id: str, book_update: BookUpdate):
             detail="No update data provided"
         )
     
-    result = await books_collection.update_one(
+    old_book = await books_collection.find_one_and_update(
         {"_id": ObjectId(book_id)},
-        {"$set": update_data}
+        {
+            "$set": {
+                **update_data,
+                **search_key_updates(update_data, BOOK_SEARCH_FIELDS),
+                "updated_at": datetime.utcnow()
+            },
+            "$inc": {"version": 1}
+        },
+        return_document=ReturnDocument.BEFORE
     )
     
-    if result.matched_count == 0:
+    if old_book is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Book not found"
         )
     
+    new_book = {**old_book, **update_data}
+    _after_book_write(new_book, old_book)
+    # Move facet counts from the old values to the new ones
+    await apply_facet_changes(facet_changes(old_book, -1) + facet_changes(new_book))
+    
     return {"message": "Book updated successfully"}
 
 async def delete_book(book_id: str):
@@ -131,25 +437,46 @@ async def delete_book(book_id: str):
             detail="Invalid book ID"
         )
     
-    result = await books_collection.delete_one({"_id": ObjectId(book_id)})
+    deleted_book = await books_collection.find_one_and_delete({"_id": ObjectId(book_id)})
     
-    if result.deleted_count == 0:
+    if deleted_book is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Book not found"
         )
     
+    _after_book_delete(deleted_book)
+    await apply_facet_changes(facet_changes(deleted_book, -1))
+    
     return {"message": "Book deleted successfully"}
 
-async def get_categories():
-    """Get all unique book categories"""
-    categories = await books_collection.distinct("category")
-    return {"categories": sorted(categories)}
+async def get_categories(prefix: Optional[str] = None, page: int = 1, page_size: int = None):
+    """Get book categories from the facet store"""
+    if page_size is None:
+        page_size = settings.MAX_PAGE_SIZE
+    
+    facets, has_more = await list_facets("category", prefix, page, page_size)
+    return {
+        "categories": [facet["value"] for facet in facets],
+        "facets": facets,
+        "page": page,
+        "page_size": page_size,
+        "has_more": has_more
+    }
 
-async def get_authors():
-    """Get all unique authors"""
-    authors = await books_collection.distinct("author")
-    return {"authors": sorted(authors)}
+async def get_authors(prefix: Optional[str] = None, page: int = 1, page_size: int = None):
+    """Get authors from the facet store"""
+    if page_size is None:
+        page_size = settings.MAX_PAGE_SIZE
+    
+    facets, has_more = await list_facets("author", prefix, page, page_size)
+    return {
+        "authors": [facet["value"] for facet in facets],
+        "facets": facets,
+        "page": page,
+        "page_size": page_size,
+        "has_more": has_more
+    }
 
 async def check_availability(book_id: str):
     """Check book availability"""
@@ -171,7 +498,61 @@ async def check_availability(book_id: str):
         "title": book["title"],
         "total_copies": book["total_copies"],
         "available_copies": book["available_copies"],
-        "is_available": book["available_copies"] > 0
+        "is_available": book["available_copies"] > 0,
+        "version": book.get("version", 0),
+        "updated_at": book.get("updated_at") or book.get("created_at")
+    }
+
+async def check_availability_batch(request: BatchAvailabilityRequest):
+    """Check availability of many books (by ID and/or ISBN) in one query"""
+    if len(request.book_ids) + len(request.isbns) > settings.MAX_BATCH_LOOKUP:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.MAX_BATCH_LOOKUP} book IDs/ISBNs per request"
+        )
+    
+    object_ids = [ObjectId(book_id) for book_id in request.book_ids if ObjectId.is_valid(book_id)]
+    clauses = []
+    if object_ids:
+        clauses.append({"_id": {"$in": object_ids}})
+    if request.isbns:
+        clauses.append({"isbn": {"$in": request.isbns}})
+    
+    by_id = {}
+    by_isbn = {}
+    if clauses:
+        cursor = books_collection.find(
+            {"$or": clauses},
+            {"isbn": 1, "total_copies": 1, "available_copies": 1}
+        )
+        async for book in cursor:
+            availability = {
+                "book_id": str(book["_id"]),
+                "isbn": book.get("isbn"),
+                "total_copies": book["total_copies"],
+                "available_copies": book["available_copies"],
+                "is_available": book["available_copies"] > 0
+            }
+            by_id[availability["book_id"]] = availability
+            by_isbn[availability["isbn"]] = availability
+    
+    results = []
+    not_found = []
+    for book_id in request.book_ids:
+        if book_id in by_id:
+            results.append(by_id[book_id])
+        else:
+            not_found.append(book_id)
+    for isbn in request.isbns:
+        if isbn in by_isbn:
+            results.append(by_isbn[isbn])
+        else:
+            not_found.append(isbn)
+    
+    return {
+        "results": results,
+        "not_found": not_found,
+        "total": len(results)
     }
 
 async def upload_book_with_image(
@@ -186,21 +567,6 @@ async def upload_book_with_image(
     description: str = None
 ):
     """Upload book with cover image (form data)"""
-    # Handle file upload
-    cover_image_path = None
-    if cover_image:
-        # Create uploads directory if it doesn't exist
-        upload_dir = "uploads/covers"
-        os.makedirs(upload_dir, exist_ok=True)
-        
-        # Save file
-        file_path = os.path.join(upload_dir, f"{isbn}_{cover_image.filename}")
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(cover_image.file, buffer)
-        
-        cover_image_path = file_path
-    
-    # Create book
     book_data = BookCreate(
         title=title,
         author=author,
@@ -209,9 +575,14 @@ async def upload_book_with_image(
         total_copies=total_copies,
         publisher=publisher,
         publication_year=publication_year,
-        description=description,
-        cover_image=cover_image_path
+        description=description
     )
     
+    # Reject duplicates before the cover is written, so no file is left behind
+    await _check_isbn_free(isbn)
+    if cover_image:
+        # Content-addressed, thumbnailed in the background pool
+        book_data.cover_image = await save_cover(cover_image)
+    
     return await add_book(book_data)
 
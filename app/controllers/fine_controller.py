@@ -1,6 +1,8 @@
 from app.cores.database import fines_collection, transactions_collection, members_collection
 from app.schemas.fine_schema import PayFineRequest, WaiveFineRequest
 from app.cores.config import settings
+from app.utils.pagination import count_total, trim_page
+from app.utils.member_counters import adjust_member_counters
 from fastapi import HTTPException, status
 from bson import ObjectId
 from datetime import datetime
@@ -9,7 +11,9 @@ async def list_fines(
     member_id: str = None,
     fine_status: str = None,
     page: int = 1,
-    page_size: int = None
+    page_size: int = None,
+    count_strategy: str = "exact",
+    include_total: bool = True
 ):
     """List fines with filters"""
     if page_size is None:
@@ -35,11 +39,14 @@ async def list_fines(
             )
         query["status"] = fine_status
     
-    total = await fines_collection.count_documents(query)
+    total, count_used = await count_total(fines_collection, query, count_strategy, include_total)
+    
+    limit = page_size if total is not None else page_size + 1
+    page_docs = await fines_collection.find(query).sort("created_at", -1).skip(skip).limit(limit).to_list(length=limit)
+    page_docs, has_more = trim_page(page_docs, page_size, skip, total)
     
     fines = []
-    cursor = fines_collection.find(query).sort("created_at", -1).skip(skip).limit(page_size)
-    async for fine in cursor:
+    for fine in page_docs:
         # Get member details
         member = await members_collection.find_one({"_id": ObjectId(fine["member_id"])})
         
@@ -54,7 +61,9 @@ async def list_fines(
         "fines": fines,
         "total": total,
         "page": page,
-        "page_size": page_size
+        "page_size": page_size,
+        "has_more": has_more,
+        "count_strategy": count_used
     }
 
 async def pay_fine(fine_id: str, payment_data: PayFineRequest):
@@ -78,9 +87,9 @@ async def pay_fine(fine_id: str, payment_data: PayFineRequest):
             detail=f"Fine is already {fine['status']}"
         )
     
-    # Update fine status
-    await fines_collection.update_one(
-        {"_id": ObjectId(fine_id)},
+    # Update fine status, unless it was settled concurrently
+    result = await fines_collection.update_one(
+        {"_id": ObjectId(fine_id), "status": "pending"},
         {
             "$set": {
                 "status": "paid",
@@ -90,6 +99,12 @@ async def pay_fine(fine_id: str, payment_data: PayFineRequest):
             }
         }
     )
+    if result.modified_count == 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Fine is no longer pending"
+        )
+    await adjust_member_counters(fine["member_id"], fines=-fine["amount"])
     
     return {
         "message": "Fine paid successfully",
@@ -118,9 +133,9 @@ async def waive_fine(fine_id: str, waive_data: WaiveFineRequest):
             detail=f"Fine is already {fine['status']}"
         )
     
-    # Update fine status
-    await fines_collection.update_one(
-        {"_id": ObjectId(fine_id)},
+    # Update fine status, unless it was settled concurrently
+    result = await fines_collection.update_one(
+        {"_id": ObjectId(fine_id), "status": "pending"},
         {
             "$set": {
                 "status": "waived",
@@ -129,6 +144,12 @@ async def waive_fine(fine_id: str, waive_data: WaiveFineRequest):
             }
         }
     )
+    if result.modified_count == 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Fine is no longer pending"
+        )
+    await adjust_member_counters(fine["member_id"], fines=-fine["amount"])
     
     return {
         "message": "Fine waived successfully",
@@ -1,6 +1,10 @@
 from app.cores.database import members_collection, users_collection, transactions_collection
 from app.schemas.member_schema import MemberCreate, MemberUpdate
 from app.cores.config import settings
+from app.utils.pagination import count_total, trim_page, total_pages
+from app.utils.fuzzy_index import fuzzy_search
+from app.utils.member_counters import COUNTER_FIELDS
+from app.utils.query_compiler import match_any, prefix, time_limited, time_limit
 from fastapi import HTTPException, status
 from bson import ObjectId
 from datetime import datetime, timedelta
@@ -19,7 +23,12 @@ async def generate_membership_id():
         if not existing:
             return membership_id
 
-async def list_members(page: int = 1, page_size: int = None):
+async def list_members(
+    page: int = 1,
+    page_size: int = None,
+    count_strategy: str = "exact",
+    include_total: bool = True
+):
     """List all members with pagination"""
     if page_size is None:
         page_size = settings.DEFAULT_PAGE_SIZE
@@ -27,11 +36,14 @@ async def list_members(page: int = 1, page_size: int = None):
     page_size = min(page_size, settings.MAX_PAGE_SIZE)
     skip = (page - 1) * page_size
     
-    total = await members_collection.count_documents({})
+    total, count_used = await count_total(members_collection, {}, count_strategy, include_total)
+    
+    limit = page_size if total is not None else page_size + 1
+    page_docs = await members_collection.find({}).skip(skip).limit(limit).to_list(length=limit)
+    page_docs, has_more = trim_page(page_docs, page_size, skip, total)
     
     members = []
-    cursor = members_collection.find({}).skip(skip).limit(page_size)
-    async for member in cursor:
+    for member in page_docs:
         # Get user details
         user = await users_collection.find_one({"_id": ObjectId(member["user_id"])})
         
@@ -48,7 +60,9 @@ async def list_members(page: int = 1, page_size: int = None):
         "total": total,
         "page": page,
         "page_size": page_size,
-        "total_pages": (total + page_size - 1) // page_size
+        "total_pages": total_pages(total, page_size),
+        "has_more": has_more,
+        "count_strategy": count_used
     }
 
 async def add_member(member_data: MemberCreate):
@@ -91,7 +105,8 @@ async def add_member(member_data: MemberCreate):
         "membership_start": datetime.utcnow(),
         "membership_end": datetime.utcnow() + timedelta(days=365),  # 1 year
         "max_books_allowed": max_books,
-        "is_active": True
+        "is_active": True,
+        **COUNTER_FIELDS
     }
     
     result = await members_collection.insert_one(member_doc)
@@ -131,8 +146,19 @@ async def update_member(member_id: str, member_update: MemberUpdate):
     
     return {"message": "Member updated successfully"}
 
-async def search_members(query: str, page: int = 1, page_size: int = None):
-    """Search members by name, email, or membership ID"""
+async def search_members(
+    query: str,
+    page: int = 1,
+    page_size: int = None,
+    fuzzy: bool = False,
+    search_mode: str = "regex"
+):
+    """Search members by name, email, or membership ID
+
+    With `fuzzy=True` names are matched by trigram similarity, so typos
+    still find the member. `search_mode="prefix"` matches the start of each
+    field with index-friendly anchored lookups instead of substrings.
+    """
     if page_size is None:
         page_size = settings.DEFAULT_PAGE_SIZE
     
@@ -140,30 +166,35 @@ async def search_members(query: str, page: int = 1, page_size: int = None):
     skip = (page - 1) * page_size
     
     # Search in members collection
-    member_query = {
-        "$or": [
-            {"membership_id": {"$regex": query, "$options": "i"}},
-            {"phone": {"$regex": query, "$options": "i"}}
-        ]
-    }
+    if search_mode == "prefix":
+        # Membership IDs are stored upper case and phones as entered, so both
+        # are matched as ranges on the fields themselves
+        member_query = {
+            "$or": [
+                prefix("membership_id", query, stored_as=str.upper),
+                prefix("phone", query, stored_as=str)
+            ]
+        }
+    else:
+        member_query = {"$or": match_any(["membership_id", "phone"], query)}
     
     # Also search in users collection
+    user_query = {"$or": match_any(["email", "full_name"], query, search_mode)}
+    if fuzzy:
+        names = [name for name, _ in await fuzzy_search("members", query)]
+        user_query["$or"][1] = {"full_name": {"$in": names}}
+    
     users = []
-    async for user in users_collection.find({
-        "$or": [
-            {"email": {"$regex": query, "$options": "i"}},
-            {"full_name": {"$regex": query, "$options": "i"}}
-        ]
-    }):
+    async for user in time_limited(users_collection.find(user_query, {"_id": 1})):
         users.append(str(user["_id"]))
     
     if users:
         member_query["$or"].append({"user_id": {"$in": users}})
     
-    total = await members_collection.count_documents(member_query)
+    total = await members_collection.count_documents(member_query, **time_limit())
     
     members = []
-    cursor = members_collection.find(member_query).skip(skip).limit(page_size)
+    cursor = time_limited(members_collection.find(member_query)).skip(skip).limit(page_size)
     async for member in cursor:
         user = await users_collection.find_one({"_id": ObjectId(member["user_id"])})
         
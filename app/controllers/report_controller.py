@@ -1,5 +1,7 @@
-from app.cores.database import transactions_collection, fines_collection, books_collection
+from app.cores.database import transactions_collection, fines_collection
 from app.schemas.report_schema import ReportRequest
+from app.utils.book_cache import get_cached_books
+from app.utils.popularity import top_books
 from datetime import datetime
 from typing import Optional
 import csv
@@ -76,29 +78,27 @@ async def fines_report(start_date: datetime = None, end_date: datetime = None):
         "generated_at": datetime.utcnow()
     }
 
-async def popular_books_report(limit: int = 10):
-    """Generate popular books report"""
-    pipeline = [
-        {"$group": {"_id": "$book_id", "borrow_count": {"$sum": 1}}},
-        {"$sort": {"borrow_count": -1}},
-        {"$limit": limit}
-    ]
+async def popular_books_report(limit: int = 10, window: str = "all"):
+    """Generate popular books report from the materialized popularity counters"""
+    ranking = await top_books(window, limit)
+    books = await get_cached_books(book_id for book_id, _ in ranking)
     
     popular_books = []
-    async for result in transactions_collection.aggregate(pipeline):
-        book = await books_collection.find_one({"_id": result["_id"]})
+    for book_id, borrow_count in ranking:
+        book = books.get(str(book_id))
         if book:
             popular_books.append({
                 "book_id": str(book["_id"]),
                 "title": book["title"],
                 "author": book["author"],
-                "borrow_count": result["borrow_count"]
+                "borrow_count": borrow_count
             })
     
     return {
         "report_type": "popular_books",
         "data": {
-            "books": popular_books
+            "books": popular_books,
+            "window": window
         },
         "generated_at": datetime.utcnow()
     }
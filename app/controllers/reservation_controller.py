@@ -1,5 +1,6 @@
 from app.cores.database import reservations_collection, books_collection, members_collection
 from app.schemas.reservation_schema import ReservationCreate
+from app.utils.book_cache import get_cached_books
 from fastapi import HTTPException, status
 from bson import ObjectId
 from datetime import datetime, timedelta
@@ -24,11 +25,13 @@ async def list_reservations(member_id: str = None, book_id: str = None):
             )
         query["book_id"] = book_id
     
+    active = await reservations_collection.find(query).sort("reservation_date", 1).to_list(length=None)
+    books = await get_cached_books(reservation["book_id"] for reservation in active)
+    
     reservations = []
-    cursor = reservations_collection.find(query).sort("reservation_date", 1)
-    async for reservation in cursor:
+    for reservation in active:
         # Get book and member details
-        book = await books_collection.find_one({"_id": ObjectId(reservation["book_id"])})
+        book = books.get(reservation["book_id"])
         member = await members_collection.find_one({"_id": ObjectId(reservation["member_id"])})
         
         reservation["id"] = str(reservation.pop("_id"))
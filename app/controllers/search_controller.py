@@ -1,18 +1,66 @@
 from app.cores.database import books_collection, transactions_collection
 from app.schemas.search_schema import AdvancedSearchRequest
+from app.schemas.book_schema import BOOK_LIST_FIELDS
+from app.utils.utils import build_projection, with_text_score
+from app.utils.book_cache import get_cached_books
+from app.utils.pagination import total_pages
+from app.cores.config import settings
+from app.utils.search_index import ensure_search_index
+from app.utils.autocomplete import ensure_autocomplete, SUGGESTION_FIELDS
+from app.utils.vector_index import vector_index
+from app.utils.fuzzy_index import fuzzy_book_clauses, fuzzy_search
+from app.utils.recommender import ensure_co_borrow_model
+from app.utils.recommendation_cache import recommendation_cache
+from app.utils.popularity import top_books
+from app.utils.query_compiler import SEARCH_KEYS, BOOK_SEARCH_FIELDS, HIDDEN_FIELDS, match_field, match_any, time_limit
+from starlette.concurrency import run_in_threadpool
 from fastapi import HTTPException, status
 from bson import ObjectId
 from typing import Optional
 
-async def advanced_search(search_params: AdvancedSearchRequest):
-    """Advanced search with multiple filters"""
+# Facet counts computed alongside each advanced search page
+SEARCH_FACETS = {
+    "categories": [
+        {"$group": {"_id": "$category", "count": {"$sum": 1}}},
+        {"$sort": {"count": -1, "_id": 1}},
+        {"$limit": 50}
+    ],
+    "decades": [
+        {"$match": {"publication_year": {"$type": "number"}}},
+        {"$group": {
+            "_id": {"$subtract": ["$publication_year", {"$mod": ["$publication_year", 10]}]},
+            "count": {"$sum": 1}
+        }},
+        {"$sort": {"_id": 1}}
+    ],
+    "availability": [
+        {"$group": {"_id": {"$gt": ["$available_copies", 0]}, "count": {"$sum": 1}}}
+    ]
+}
+
+async def advanced_search(search_params: AdvancedSearchRequest, fields: Optional[str] = None):
+    """Advanced search with multiple filters, sorting and pagination
+
+    The page, the total and (unless `include_facets` is off) counts by
+    category, publication decade and availability come back from a single
+    `$facet` aggregation.
+    """
     query = {}
+    projection = build_projection(fields, BOOK_LIST_FIELDS)
+    
+    if search_params.query and search_params.search_mode == "text":
+        query["$text"] = {"$search": search_params.query}
+        projection = with_text_score(projection)
+    elif search_params.query and search_params.search_mode == "fuzzy":
+        query["$or"] = await fuzzy_book_clauses(search_params.query)
+    elif search_params.query:
+        query["$or"] = match_any(BOOK_SEARCH_FIELDS, search_params.query, search_params.search_mode)
     
     if search_params.title:
-        query["title"] = {"$regex": search_params.title, "$options": "i"}
+        query.update(match_field("title", search_params.title, search_params.search_mode))
     
     if search_params.author:
-        query["author"] = {"$regex": search_params.author, "$options": "i"}
+        query.update(match_field("author", search_params.author, search_params.search_mode))
     
     if search_params.category:
         query["category"] = search_params.category
@@ -31,159 +79,239 @@ async def advanced_search(search_params: AdvancedSearchRequest):
     if search_params.available_only:
         query["available_copies"] = {"$gt": 0}
     
-    books = []
-    cursor = books_collection.find(query)
-    async for book in cursor:
+    page_size = min(search_params.page_size or settings.DEFAULT_PAGE_SIZE, settings.MAX_PAGE_SIZE)
+    skip = (search_params.page - 1) * page_size
+    
+    # Page of results; `_id` breaks ties so pages stay stable
+    if search_params.sort_by == "relevance" and "$text" in query:
+        sort = {"relevance_score": {"$meta": "textScore"}, "_id": 1}
+    elif search_params.sort_by == "relevance":
+        sort = {"_id": 1}
+    else:
+        direction = 1 if search_params.sort_order == "asc" else -1
+        sort = {search_params.sort_by: direction, "_id": direction}
+    
+    page_stages = [{"$sort": sort}, {"$skip": skip}, {"$limit": page_size}]
+    if projection is not None:
+        page_stages.append({"$project": projection})
+    else:
+        page_stages.append({"$unset": SEARCH_KEYS})
+        if "$text" in query:
+            page_stages.append({"$addFields": {"relevance_score": {"$meta": "textScore"}}})
+    
+    facets = {
+        "books": page_stages,
+        "total": [{"$count": "count"}]
+    }
+    if search_params.include_facets:
+        facets.update(SEARCH_FACETS)
+    
+    pipeline = [{"$match": query}, {"$facet": facets}]
+    result = await books_collection.aggregate(pipeline, **time_limit()).next()
+    
+    books = result["books"]
+    for book in books:
         book["id"] = str(book.pop("_id"))
-        books.append(book)
     
-    return {
+    total = result["total"][0]["count"] if result["total"] else 0
+    
+    response = {
         "books": books,
-        "total": len(books)
+        "total": total,
+        "page": search_params.page,
+        "page_size": page_size,
+        "total_pages": total_pages(total, page_size),
+        "has_more": skip + len(books) < total
     }
+    
+    if search_params.include_facets:
+        availability = {"available": 0, "unavailable": 0}
+        for bucket in result["availability"]:
+            availability["available" if bucket["_id"] else "unavailable"] = bucket["count"]
+        
+        response["facets"] = {
+            "categories": [
+                {"value": bucket["_id"], "count": bucket["count"]}
+                for bucket in result["categories"]
+            ],
+            "decades": [
+                {"decade": int(bucket["_id"]), "count": bucket["count"]}
+                for bucket in result["decades"]
+            ],
+            "availability": availability
+        }
+    
+    return response
 
 async def get_suggestions(query: str, suggestion_type: str = "all"):
-    """Get search suggestions based on partial input"""
+    """Get search suggestions based on partial input, most popular first"""
     if len(query) < 2:
         return {"suggestions": [], "type": suggestion_type}
     
-    suggestions = []
+    if suggestion_type == "all":
+        suggestion_types = SUGGESTION_FIELDS.keys()
+    else:
+        suggestion_types = {suggestion_type}
     
-    if suggestion_type in ["all", "titles"]:
-        # Get title suggestions
-        titles = await books_collection.distinct("title", {
-            "title": {"$regex": f"^{query}", "$options": "i"}
-        })
-        suggestions.extend(titles[:5])
-    
-    if suggestion_type in ["all", "authors"]:
-        # Get author suggestions
-        authors = await books_collection.distinct("author", {
-            "author": {"$regex": f"^{query}", "$options": "i"}
-        })
-        suggestions.extend(authors[:5])
-    
-    if suggestion_type in ["all", "categories"]:
-        # Get category suggestions
-        categories = await books_collection.distinct("category", {
-            "category": {"$regex": f"^{query}", "$options": "i"}
-        })
-        suggestions.extend(categories[:5])
+    index = await ensure_autocomplete()
+    
+    # Over-fetch so that values shared between types still fill the list
+    suggestions = []
+    for value, _ in index.complete(query, suggestion_types, limit=20):
+        if value not in suggestions:
+            suggestions.append(value)
     
     return {
-        "suggestions": list(set(suggestions))[:10],  # Remove duplicates, limit to 10
+        "suggestions": suggestions[:10],
         "type": suggestion_type
     }
 
+async def get_fuzzy_matches(query: str, match_type: str = "all", threshold: Optional[float] = None):
+    """Similarity-ranked book titles and authors close to `query`"""
+    names = ["titles", "authors"] if match_type == "all" else [match_type]
+    
+    matches = []
+    for name in names:
+        for value, similarity in await fuzzy_search(name, query, threshold):
+            matches.append({"value": value, "type": name, "similarity": similarity})
+    matches.sort(key=lambda match: match["similarity"], reverse=True)
+    
+    return {
+        "matches": matches[:settings.FUZZY_MAX_MATCHES],
+        "query": query,
+        "threshold": threshold if threshold is not None else settings.FUZZY_THRESHOLD
+    }
+
 async def get_ai_recommendations(member_id: str):
-    """Get personalized book recommendations (rule-based)"""
+    """Get personalized book recommendations, served from the per-member cache"""
     if not ObjectId.is_valid(member_id):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid member ID"
         )
     
-    # Get member's borrowing history
-    borrowed_books = []
-    async for transaction in transactions_collection.find({"member_id": member_id}):
-        book = await books_collection.find_one({"_id": ObjectId(transaction["book_id"])})
-        if book:
-            borrowed_books.append(book)
+    return await recommendation_cache.get_or_compute(member_id)
+
+async def prewarm_recommendations():
+    """Cache recommendations for the members who borrowed most recently"""
+    member_ids = []
+    cursor = transactions_collection.find({}, {"member_id": 1}).sort("_id", -1).limit(settings.RECOMMENDATION_PREWARM_SCAN)
+    async for transaction in cursor:
+        member_id = transaction.get("member_id")
+        if member_id and member_id not in member_ids:
+            member_ids.append(member_id)
+            if len(member_ids) == settings.RECOMMENDATION_PREWARM_MEMBERS:
+                break
+    
+    await recommendation_cache.prewarm(member_ids)
+
+async def compute_recommendations(member_id: str, limit: int = 10):
+    """Build a member's recommendations from co-borrowing patterns
+
+    Books borrowed by members who borrowed the same books rank first; if
+    the co-borrow model has too little to go on, the rest of the list is
+    filled with books sharing a category or author with the history.
+    """
+    model = await ensure_co_borrow_model()
+    history = model.history(member_id)
     
-    if not borrowed_books:
+    if not history:
         # No history, recommend popular books
         return await get_popular_books()
     
-    # Get categories and authors from history
-    categories = list(set([book["category"] for book in borrowed_books if "category" in book]))
-    authors = list(set([book["author"] for book in borrowed_books if "author" in book]))
-    
-    # Find similar books
-    query = {
-        "$or": [
-            {"category": {"$in": categories}},
-            {"author": {"$in": authors}}
-        ]
-    }
+    ranked = model.recommend(member_id, limit)
+    cached = await get_cached_books(book_id for book_id, _ in ranked)
     
     recommendations = []
-    cursor = books_collection.find(query).limit(10)
-    async for book in cursor:
-        # Exclude already borrowed books
-        if str(book["_id"]) not in [str(b["_id"]) for b in borrowed_books]:
+    for book_id, score in ranked:
+        book = cached.get(book_id)
+        if book:
+            book.pop("_id")
+            book["id"] = book_id
+            book["score"] = round(score, 4)
+            recommendations.append(book)
+    
+    based_on = {"borrowed_books": len(history), "strategy": "co-borrow"}
+    
+    if len(recommendations) < limit:
+        # Top up with books sharing a category or author with recent history
+        recent = list((await get_cached_books(history[-settings.RECOMMENDATION_HISTORY_LIMIT:])).values())
+        categories = list({book["category"] for book in recent if book.get("category")})
+        authors = list({book["author"] for book in recent if book.get("author")})
+        exclude = [ObjectId(book_id) for book_id in history] + [ObjectId(book["id"]) for book in recommendations]
+        
+        query = {
+            "$or": [
+                {"category": {"$in": categories}},
+                {"author": {"$in": authors}}
+            ],
+            "_id": {"$nin": exclude}
+        }
+        cursor = books_collection.find(query, HIDDEN_FIELDS).limit(limit - len(recommendations))
+        async for book in cursor:
             book["id"] = str(book.pop("_id"))
             recommendations.append(book)
+        
+        based_on.update({"strategy": "co-borrow+content", "categories": categories, "authors": authors})
     
     return {
         "recommendations": recommendations,
-        "based_on": {
-            "categories": categories,
-            "authors": authors
-        }
+        "based_on": based_on
     }
 
-async def semantic_search(query: str):
-    """Semantic search (simplified text-based version)"""
-    # In a full implementation, this would use vector embeddings
-    # For now, we'll do a comprehensive text search
-    
-    search_query = {
-        "$or": [
-            {"title": {"$regex": query, "$options": "i"}},
-            {"author": {"$regex": query, "$options": "i"}},
-            {"description": {"$regex": query, "$options": "i"}},
-            {"category": {"$regex": query, "$options": "i"}},
-            {"publisher": {"$regex": query, "$options": "i"}}
-        ]
-    }
+recommendation_cache.compute = compute_recommendations
+
+async def semantic_search(query: str, fields: Optional[str] = None, limit: int = 20, method: str = "bm25"):
+    """Full-text search ranked with BM25, or by cosine similarity of book vectors"""
+    if method == "vector":
+        hits = await run_in_threadpool(vector_index.search, query, limit)
+        if vector_index.matrix is None:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Vector index has not been built"
+            )
+    else:
+        index = await ensure_search_index()
+        hits = await run_in_threadpool(index.search, query, limit)
+    
+    projection = build_projection(fields, BOOK_LIST_FIELDS)
+    cached = await get_cached_books(book_id for book_id, _ in hits)
     
     books = []
-    cursor = books_collection.find(search_query).limit(20)
-    async for book in cursor:
-        book["id"] = str(book.pop("_id"))
-        
-        # Calculate relevance score (simple version)
-        score = 0
-        if query.lower() in book.get("title", "").lower():
-            score += 10
-        if query.lower() in book.get("author", "").lower():
-            score += 5
-        if query.lower() in book.get("description", "").lower():
-            score += 3
+    for book_id, score in hits:
+        book = cached.get(book_id)
+        if not book:
+            continue
         
-        book["relevance_score"] = score
+        book.pop("_id")
+        if projection is not None:
+            book = {name: book[name] for name in projection if name in book}
+        book["id"] = book_id
+        book["relevance_score"] = round(score, 4)
         books.append(book)
     
-    # Sort by relevance
-    books.sort(key=lambda x: x["relevance_score"], reverse=True)
-    
     return {
         "books": books,
         "query": query,
+        "method": method,
         "total": len(books)
     }
 
-async def get_popular_books(limit: int = 10):
-    """Get most borrowed books"""
-    # Aggregate transactions to find most borrowed books
-    pipeline = [
-        {"$group": {"_id": "$book_id", "borrow_count": {"$sum": 1}}},
-        {"$sort": {"borrow_count": -1}},
-        {"$limit": limit}
-    ]
-    
-    popular_book_ids = []
-    async for result in transactions_collection.aggregate(pipeline):
-        popular_book_ids.append(result["_id"])
+async def get_popular_books(limit: int = 10, window: str = "all"):
+    """Get most borrowed books, all time or over the last 7 or 30 days"""
+    ranking = await top_books(window, limit)
+    cached = await get_cached_books(book_id for book_id, _ in ranking)
     
     books = []
-    for book_id in popular_book_ids:
-        book = await books_collection.find_one({"_id": ObjectId(book_id)})
+    for book_id, borrow_count in ranking:
+        book = cached.get(str(book_id))
         if book:
             book["id"] = str(book.pop("_id"))
+            book["borrow_count"] = borrow_count
             books.append(book)
     
     return {
         "popular_books": books,
+        "window": window,
         "total": len(books)
     }
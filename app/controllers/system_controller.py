@@ -1,6 +1,8 @@
 from app.cores.database import system_settings_collection, users_collection, db
 from app.schemas.system_schema import SettingUpdate, StaffCreate
 from app.utils.utils import hash_password
+from app.utils.fuzzy_index import fuzzy_user_added
+from app.utils.query_compiler import SEARCH_KEYS, USER_SEARCH_FIELDS, search_keys
 from fastapi import HTTPException, status
 from bson import ObjectId
 from datetime import datetime
@@ -112,8 +114,10 @@ async def add_staff(staff_data: StaffCreate):
         "is_active": True,
         "created_at": datetime.utcnow()
     }
+    user_doc[SEARCH_KEYS] = search_keys(user_doc, USER_SEARCH_FIELDS)
     
     result = await users_collection.insert_one(user_doc)
+    fuzzy_user_added(user_doc)
     
     return {
         "message": "Staff member added successfully",
@@ -1,10 +1,122 @@
-from app.cores.database import transactions_collection, books_collection, members_collection, fines_collection
-from app.schemas.transaction_schema import BorrowRequest, ReturnRequest
-from app.utils.utils import calculate_fine
+from app.cores.database import client, transactions_collection, books_collection, members_collection, fines_collection, users_collection
+from app.schemas.transaction_schema import BorrowRequest, BatchBorrowRequest, ReturnRequest, BatchReturnRequest
+from app.utils.utils import calculate_fine, build_projection, with_text_score, json_default, TEXT_SCORE_SORT
+from app.schemas.book_schema import BOOK_LIST_FIELDS
 from app.cores.config import settings
+from app.utils.pagination import count_total, trim_page, total_pages, encode_sort_cursor, seek_sorted_query
+from app.utils.facets import availability_changes, apply_facet_changes
+from app.utils.book_cache import book_cache, get_cached_books
+from app.utils.autocomplete import autocomplete_book_borrowed
+from app.utils.recommender import record_borrow
+from app.utils.recommendation_cache import recommendation_cache
+from app.utils.popularity import record_borrow_popularity
+from app.utils.query_compiler import HIDDEN_FIELDS, match_any, time_limited
+from app.utils.member_counters import has_counters, adjust_member_counters, adjust_member_counters_bulk
 from fastapi import HTTPException, status
 from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
 from datetime import datetime, timedelta
+import asyncio
+import json
+
+async def _reserve_copy(book_id: str, session=None):
+    """Take one copy of a book if any is available, in a single conditional update"""
+    book = await books_collection.find_one_and_update(
+        {"_id": ObjectId(book_id), "available_copies": {"$gt": 0}},
+        {"$inc": {"available_copies": -1, "version": 1}, "$set": {"updated_at": datetime.utcnow()}},
+        projection=HIDDEN_FIELDS,
+        session=session
+    )
+    if book:
+        return book
+    
+    if not await books_collection.find_one({"_id": ObjectId(book_id)}, {"_id": 1}, session=session):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Book not found"
+        )
+    raise HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="Book is not available"
+    )
+
+async def _reserve_and_record(book_id: str, transaction_doc: dict, session=None):
+    """Decrement availability and insert the loan
+    
+    Inside a session both writes commit together. Without one (a standalone
+    mongod, or BORROW_USE_TRANSACTIONS off) the copy is handed back if the
+    insert fails, so availability never drifts below the open loans.
+    """
+    book = await _reserve_copy(book_id, session)
+    try:
+        await transactions_collection.insert_one(transaction_doc, session=session)
+    except Exception:
+        if session is None:
+            await _release_copies([book_id])
+        raise
+    return book
+
+async def _release_copies(book_ids: list):
+    """Hand back copies reserved by writes that could not be completed"""
+    if not book_ids:
+        return
+    await books_collection.bulk_write([
+        UpdateOne(
+            {"_id": ObjectId(book_id)},
+            {"$inc": {"available_copies": 1, "version": 1}, "$set": {"updated_at": datetime.utcnow()}}
+        )
+        for book_id in book_ids
+    ], ordered=False)
+    for book_id in book_ids:
+        book_cache.invalidate(book_id)
+
+# Whether the server accepts multi-document transactions, detected on first use
+_transactions_supported = None
+
+async def _use_transactions() -> bool:
+    """Transactions need a replica set member or mongos; a plain mongod cannot run them"""
+    global _transactions_supported
+    if not settings.BORROW_USE_TRANSACTIONS:
+        return False
+    if _transactions_supported is None:
+        hello = await client.admin.command("hello")
+        _transactions_supported = "setName" in hello or hello.get("msg") == "isdbgrid"
+    return _transactions_supported
+
+async def _in_transaction(operation):
+    """Run `operation(session)` in a transaction, or with no session where transactions are unavailable"""
+    if not await _use_transactions():
+        return await operation(None)
+    async with await client.start_session() as session:
+        return await session.with_transaction(operation)
+
+def _loan_doc(member_id: str, book_id: str) -> dict:
+    borrow_date = datetime.utcnow()
+    return {
+        "member_id": member_id,
+        "book_id": book_id,
+        "borrow_date": borrow_date,
+        "due_date": borrow_date + timedelta(days=settings.LOAN_PERIOD_DAYS),
+        "return_date": None,
+        "status": "borrowed",
+        "fine_amount": 0.0
+    }
+
+async def _after_borrows(member_id: str, loans: list):
+    """Bring caches, models and counters up to date for `(book, transaction_doc)` loans"""
+    for book, transaction_doc in loans:
+        book_cache.invalidate(transaction_doc["book_id"])
+        autocomplete_book_borrowed(book)
+        record_borrow(transaction_doc)
+    recommendation_cache.refresh(member_id)
+    await asyncio.gather(*(
+        record_borrow_popularity(transaction_doc["book_id"], transaction_doc["borrow_date"])
+        for _, transaction_doc in loans
+    ))
+    await apply_facet_changes([
+        change for book, _ in loans for change in availability_changes(book, -1)
+    ])
 
 async def borrow_book(borrow_data: BorrowRequest):
     """Borrow a book"""
@@ -23,43 +135,187 @@ async def borrow_book(borrow_data: BorrowRequest):
             detail=eligibility["reason"]
         )
     
-    # Check book availability
-    book = await books_collection.find_one({"_id": ObjectId(borrow_data.book_id)})
-    if not book:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Book not found"
+    # Take a copy and create the transaction together
+    transaction_doc = _loan_doc(borrow_data.member_id, borrow_data.book_id)
+    
+    async def checkout(session):
+        book = await _reserve_and_record(borrow_data.book_id, transaction_doc, session)
+        await adjust_member_counters(borrow_data.member_id, borrowed=1, session=session)
+        return book
+    
+    book = await _in_transaction(checkout)
+    await _after_borrows(borrow_data.member_id, [(book, transaction_doc)])
+    
+    return {
+        "message": "Book borrowed successfully",
+        "transaction_id": str(transaction_doc["_id"]),
+        "due_date": transaction_doc["due_date"]
+    }
+
+async def _reserve_batch(book_ids: list, session=None) -> set:
+    """Take one copy of each book, returning the IDs that were reserved
+    
+    In a transaction the books were read in the same snapshot, so a single
+    guarded `bulk_write` either matches every update or conflicts and is
+    retried. A bulk result cannot say which updates matched, so without a
+    transaction the guarded updates are sent individually and concurrently.
+    """
+    if session is None:
+        reserved = await asyncio.gather(
+            *(_reserve_copy(book_id) for book_id in book_ids),
+            return_exceptions=True
         )
+        return {book_id for book_id, book in zip(book_ids, reserved) if isinstance(book, dict)}
     
-    if book["available_copies"] <= 0:
+    result = await books_collection.bulk_write([
+        UpdateOne(
+            {"_id": ObjectId(book_id), "available_copies": {"$gt": 0}},
+            {"$inc": {"available_copies": -1, "version": 1}, "$set": {"updated_at": datetime.utcnow()}}
+        )
+        for book_id in book_ids
+    ], ordered=False, session=session)
+    if result.matched_count != len(book_ids):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Book availability changed during checkout, please retry"
+        )
+    return set(book_ids)
+
+async def _find_books(book_ids: list, isbns: list) -> list:
+    """Books matching any of the given IDs or ISBNs, in one query"""
+    object_ids = [ObjectId(book_id) for book_id in book_ids if ObjectId.is_valid(book_id)]
+    clauses = []
+    if object_ids:
+        clauses.append({"_id": {"$in": object_ids}})
+    if isbns:
+        clauses.append({"isbn": {"$in": isbns}})
+    if not clauses:
+        return []
+    return await books_collection.find({"$or": clauses}, HIDDEN_FIELDS).to_list(length=None)
+
+async def borrow_books_batch(request: BatchBorrowRequest):
+    """Check out several books (by ID and/or ISBN) to one member at once
+    
+    Eligibility is checked once, against the member's open loans plus the
+    books in the request. Copies are reserved with one bulk write and the
+    loans inserted with one `insert_many`; each requested item gets its own
+    result (`borrowed`, `not_found`, `duplicate`, `unavailable`,
+    `limit_reached` or `failed`).
+    """
+    if not ObjectId.is_valid(request.member_id):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid member ID"
+        )
+    if not request.book_ids and not request.isbns:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No book IDs or ISBNs given"
+        )
+    if len(request.book_ids) + len(request.isbns) > settings.MAX_BATCH_LOOKUP:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Book is not available"
+            detail=f"At most {settings.MAX_BATCH_LOOKUP} book IDs/ISBNs per request"
         )
     
-    # Create transaction
-    transaction_doc = {
-        "member_id": borrow_data.member_id,
-        "book_id": borrow_data.book_id,
-        "borrow_date": datetime.utcnow(),
-        "due_date": datetime.utcnow() + timedelta(days=settings.LOAN_PERIOD_DAYS),
-        "return_date": None,
-        "status": "borrowed",
-        "fine_amount": 0.0
-    }
+    eligibility, books = await asyncio.gather(
+        check_member_eligibility(request.member_id),
+        _find_books(request.book_ids, request.isbns)
+    )
+    if not eligibility["is_eligible"]:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=eligibility["reason"]
+        )
     
-    result = await transactions_collection.insert_one(transaction_doc)
+    by_id = {str(book["_id"]): book for book in books}
+    by_isbn = {book.get("isbn"): book for book in books}
+    slots = eligibility["max_books_allowed"] - eligibility["current_books_borrowed"]
+    
+    items = [("book_id", book_id, by_id.get(book_id)) for book_id in request.book_ids]
+    items += [("isbn", isbn, by_isbn.get(isbn)) for isbn in request.isbns]
+    
+    results = []
+    requested = {}
+    for key, value, book in items:
+        result = {key: value}
+        results.append(result)
+        if book is None:
+            result.update(status="not_found", error="Book not found")
+            continue
+        
+        book_id = str(book["_id"])
+        result["book_id"] = book_id
+        if book_id in requested:
+            result.update(status="duplicate", error="Book already requested in this checkout")
+        elif book["available_copies"] <= 0:
+            result.update(status="unavailable", error="Book is not available")
+        elif len(requested) >= slots:
+            result.update(status="limit_reached", error=f"Maximum book limit reached ({eligibility['max_books_allowed']} books)")
+        else:
+            requested[book_id] = result
+    
+    async def checkout(session):
+        if session is not None:
+            # Re-read availability inside the transaction's snapshot
+            cursor = books_collection.find(
+                {"_id": {"$in": [ObjectId(book_id) for book_id in requested]}, "available_copies": {"$gt": 0}},
+                {"_id": 1},
+                session=session
+            )
+            candidates = [str(book["_id"]) async for book in cursor]
+        else:
+            candidates = list(requested)
+        
+        reserved = await _reserve_batch(candidates, session) if candidates else set()
+        loans = [_loan_doc(request.member_id, book_id) for book_id in requested if book_id in reserved]
+        failed = []
+        if loans:
+            try:
+                await transactions_collection.insert_many(loans, ordered=False, session=session)
+            except BulkWriteError as error:
+                if session is not None:
+                    raise
+                # Unordered, so only the loans reported here are missing
+                indexes = {write_error["index"] for write_error in error.details["writeErrors"]}
+                failed = [loan["book_id"] for index, loan in enumerate(loans) if index in indexes]
+                loans = [loan for index, loan in enumerate(loans) if index not in indexes]
+                await _release_copies(failed)
+            except Exception:
+                if session is None:
+                    # Outcome unknown: hand back only copies whose loan is not on record
+                    cursor = transactions_collection.find(
+                        {"_id": {"$in": [loan["_id"] for loan in loans if "_id" in loan]}},
+                        {"book_id": 1}
+                    )
+                    recorded = {transaction["book_id"] async for transaction in cursor}
+                    await _release_copies([book_id for book_id in reserved if book_id not in recorded])
+                raise
+            if loans:
+                await adjust_member_counters(request.member_id, borrowed=len(loans), session=session)
+        return loans, failed
+    
+    loans, failed = await _in_transaction(checkout) if requested else ([], [])
+    
+    for transaction_doc in loans:
+        requested[transaction_doc["book_id"]].update(
+            status="borrowed",
+            transaction_id=str(transaction_doc["_id"]),
+            due_date=transaction_doc["due_date"]
+        )
+    for book_id in failed:
+        requested[book_id].update(status="failed", error="Loan could not be recorded, please retry")
+    for result in requested.values():
+        if "status" not in result:
+            result.update(status="unavailable", error="Book is not available")
     
-    # Update book availability
-    await books_collection.update_one(
-        {"_id": ObjectId(borrow_data.book_id)},
-        {"$inc": {"available_copies": -1}}
-    )
+    await _after_borrows(request.member_id, [(by_id[doc["book_id"]], doc) for doc in loans])
     
     return {
-        "message": "Book borrowed successfully",
-        "transaction_id": str(result.inserted_id),
-        "due_date": transaction_doc["due_date"]
+        "member_id": request.member_id,
+        "borrowed": len(loans),
+        "failed": len(results) - len(loans),
+        "results": results
     }
 
 async def return_book(return_data: ReturnRequest):
@@ -88,9 +344,9 @@ async def return_book(return_data: ReturnRequest):
     return_date = datetime.utcnow()
     fine_amount = calculate_fine(transaction["due_date"], return_date)
     
-    # Update transaction
-    await transactions_collection.update_one(
-        {"_id": ObjectId(return_data.transaction_id)},
+    # Update transaction, unless it was returned concurrently
+    result = await transactions_collection.update_one(
+        {"_id": ObjectId(return_data.transaction_id), "status": "borrowed"},
         {
             "$set": {
                 "return_date": return_date,
@@ -99,25 +355,28 @@ async def return_book(return_data: ReturnRequest):
             }
         }
     )
+    if result.modified_count == 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Book already returned"
+        )
+    
+    await adjust_member_counters(transaction["member_id"], borrowed=-1, fines=fine_amount)
     
     # Update book availability
-    await books_collection.update_one(
+    book = await books_collection.find_one_and_update(
         {"_id": ObjectId(transaction["book_id"])},
-        {"$inc": {"available_copies": 1}}
+        {"$inc": {"available_copies": 1, "version": 1}, "$set": {"updated_at": datetime.utcnow()}},
+        projection={"category": 1, "author": 1}
     )
+    book_cache.invalidate(transaction["book_id"])
+    recommendation_cache.refresh(transaction["member_id"])
+    if book:
+        await apply_facet_changes(availability_changes(book, 1))
     
     # Create fine record if applicable
     if fine_amount > 0:
-        fine_doc = {
-            "transaction_id": return_data.transaction_id,
-            "member_id": transaction["member_id"],
-            "amount": fine_amount,
-            "reason": "Overdue return",
-            "status": "pending",
-            "created_at": datetime.utcnow(),
-            "paid_at": None
-        }
-        await fines_collection.insert_one(fine_doc)
+        await fines_collection.insert_one(_fine_doc(transaction, fine_amount))
     
     return {
         "message": "Book returned successfully",
@@ -125,10 +384,178 @@ async def return_book(return_data: ReturnRequest):
         "return_date": return_date
     }
 
+def _fine_doc(transaction: dict, amount: float) -> dict:
+    return {
+        "transaction_id": str(transaction["_id"]),
+        "member_id": transaction["member_id"],
+        "amount": amount,
+        "reason": "Overdue return",
+        "status": "pending",
+        "created_at": datetime.utcnow(),
+        "paid_at": None
+    }
+
+async def _find_returnable(transaction_ids: list, isbns: list):
+    """Transactions by ID, plus open loans of the books with the given ISBNs
+    
+    Loans for an ISBN are oldest first, so repeated scans of the same title
+    return its copies in the order they were borrowed.
+    """
+    object_ids = [ObjectId(transaction_id) for transaction_id in transaction_ids if ObjectId.is_valid(transaction_id)]
+    by_id = {}
+    if object_ids:
+        async for transaction in transactions_collection.find({"_id": {"$in": object_ids}}):
+            by_id[str(transaction["_id"])] = transaction
+    
+    by_isbn = {}
+    if isbns:
+        books = await books_collection.find({"isbn": {"$in": isbns}}, {"isbn": 1}).to_list(length=None)
+        isbn_of = {str(book["_id"]): book["isbn"] for book in books}
+        cursor = transactions_collection.find(
+            {"book_id": {"$in": list(isbn_of)}, "status": "borrowed"}
+        ).sort("borrow_date", 1)
+        async for transaction in cursor:
+            by_isbn.setdefault(isbn_of[transaction["book_id"]], []).append(transaction)
+    
+    return by_id, by_isbn
+
+async def return_books_batch(request: BatchReturnRequest):
+    """Return many loans at once (by transaction ID and/or scanned ISBN)
+    
+    Fines for the whole batch are computed up front; the transaction
+    updates, availability increments, fine inserts and member counter
+    changes then go out as one bulk write each. Updates are guarded on `status: borrowed`, so a loan
+    returned concurrently elsewhere is reported rather than returned twice.
+    Each item gets its own result (`returned`, `not_found`,
+    `already_returned`, `duplicate` or `no_open_loan`).
+    """
+    if not request.transaction_ids and not request.isbns:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No transaction IDs or ISBNs given"
+        )
+    if len(request.transaction_ids) + len(request.isbns) > settings.MAX_BATCH_LOOKUP:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.MAX_BATCH_LOOKUP} transaction IDs/ISBNs per request"
+        )
+    
+    by_id, by_isbn = await _find_returnable(request.transaction_ids, request.isbns)
+    
+    return_date = datetime.utcnow()
+    # Stamped on the loans this batch returns, to tell them from concurrent returns
+    return_batch_id = ObjectId()
+    
+    results = []
+    returning = {}
+    items = [("transaction_id", transaction_id, by_id.get(transaction_id)) for transaction_id in request.transaction_ids]
+    claimed = set(request.transaction_ids)
+    for isbn in request.isbns:
+        # Each scan of an ISBN takes its next open loan not already in the batch
+        transaction = next((loan for loan in by_isbn.get(isbn, []) if str(loan["_id"]) not in claimed), None)
+        if transaction is not None:
+            claimed.add(str(transaction["_id"]))
+        items.append(("isbn", isbn, transaction))
+    
+    for key, value, transaction in items:
+        result = {key: value}
+        results.append(result)
+        if transaction is None:
+            if key == "isbn":
+                result.update(status="no_open_loan", error="No open loan for this ISBN")
+            else:
+                result.update(status="not_found", error="Transaction not found")
+            continue
+        
+        transaction_id = str(transaction["_id"])
+        result.update(transaction_id=transaction_id, member_id=transaction["member_id"], book_id=transaction["book_id"])
+        if transaction_id in returning:
+            result.update(status="duplicate", error="Transaction already in this batch")
+        elif transaction["status"] == "returned":
+            result.update(status="already_returned", error="Book already returned")
+        else:
+            transaction["fine_amount"] = calculate_fine(transaction["due_date"], return_date)
+            returning[transaction_id] = (transaction, result)
+    
+    returned = []
+    if returning:
+        update = await transactions_collection.bulk_write([
+            UpdateOne(
+                {"_id": transaction["_id"], "status": "borrowed"},
+                {"$set": {
+                    "return_date": return_date,
+                    "status": "returned",
+                    "fine_amount": transaction["fine_amount"],
+                    "return_batch_id": return_batch_id
+                }}
+            )
+            for transaction, _ in returning.values()
+        ], ordered=False)
+        
+        if update.matched_count == len(returning):
+            returned = list(returning)
+        else:
+            cursor = transactions_collection.find(
+                {"_id": {"$in": [ObjectId(transaction_id) for transaction_id in returning]}, "return_batch_id": return_batch_id},
+                {"_id": 1}
+            )
+            returned = [str(transaction["_id"]) async for transaction in cursor]
+    
+    copies = {}
+    fines = []
+    members = {}
+    for transaction_id in returned:
+        transaction, result = returning[transaction_id]
+        result.update(status="returned", fine_amount=transaction["fine_amount"], return_date=return_date)
+        copies[transaction["book_id"]] = copies.get(transaction["book_id"], 0) + 1
+        borrowed, fined = members.get(transaction["member_id"], (0, 0.0))
+        members[transaction["member_id"]] = (borrowed - 1, fined + transaction["fine_amount"])
+        if transaction["fine_amount"] > 0:
+            fines.append(_fine_doc(transaction, transaction["fine_amount"]))
+    for transaction, result in returning.values():
+        if "status" not in result:
+            result.update(status="already_returned", error="Book already returned")
+    
+    if copies:
+        updated_at = datetime.utcnow()
+        book_ids = [ObjectId(book_id) for book_id in copies]
+        writes = [
+            books_collection.bulk_write([
+                UpdateOne(
+                    {"_id": ObjectId(book_id)},
+                    {"$inc": {"available_copies": count, "version": 1}, "$set": {"updated_at": updated_at}}
+                )
+                for book_id, count in copies.items()
+            ], ordered=False),
+            books_collection.find({"_id": {"$in": book_ids}}, {"category": 1, "author": 1}).to_list(length=None),
+            adjust_member_counters_bulk(members)
+        ]
+        if fines:
+            writes.append(fines_collection.insert_many(fines, ordered=False))
+        _, books, *_ = await asyncio.gather(*writes)
+        
+        for book_id in copies:
+            book_cache.invalidate(book_id)
+        for member_id in members:
+            recommendation_cache.refresh(member_id)
+        await apply_facet_changes([
+            change for book in books for change in availability_changes(book, copies[str(book["_id"])])
+        ])
+    
+    return {
+        "returned": len(returned),
+        "failed": len(results) - len(returned),
+        "total_fines": sum(fine["amount"] for fine in fines),
+        "return_date": return_date,
+        "results": results
+    }
+
 async def get_transaction_history(
     member_id: str = None,
     page: int = 1,
-    page_size: int = None
+    page_size: int = None,
+    count_strategy: str = "exact",
+    include_total: bool = True
 ):
     """Get transaction history"""
     if page_size is None:
@@ -146,13 +573,18 @@ async def get_transaction_history(
             )
         query["member_id"] = member_id
     
-    total = await transactions_collection.count_documents(query)
+    total, count_used = await count_total(transactions_collection, query, count_strategy, include_total)
+    
+    limit = page_size if total is not None else page_size + 1
+    page_docs = await transactions_collection.find(query).sort("borrow_date", -1).skip(skip).limit(limit).to_list(length=limit)
+    page_docs, has_more = trim_page(page_docs, page_size, skip, total)
+    
+    # Get book details for the whole page at once
+    books = await get_cached_books(transaction["book_id"] for transaction in page_docs)
     
     transactions = []
-    cursor = transactions_collection.find(query).sort("borrow_date", -1).skip(skip).limit(page_size)
-    async for transaction in cursor:
-        # Get book details
-        book = await books_collection.find_one({"_id": ObjectId(transaction["book_id"])})
+    for transaction in page_docs:
+        book = books.get(transaction["book_id"])
         
         transaction["id"] = str(transaction.pop("_id"))
         if book:
@@ -166,36 +598,68 @@ async def get_transaction_history(
         "transactions": transactions,
         "total": total,
         "page": page,
-        "page_size": page_size
+        "page_size": page_size,
+        "has_more": has_more,
+        "count_strategy": count_used
     }
 
-async def get_overdue_transactions():
-    """Get all overdue transactions"""
-    current_date = datetime.utcnow()
-    
-    query = {
+def _overdue_query(current_date: datetime) -> dict:
+    return {
         "status": "borrowed",
         "due_date": {"$lt": current_date}
     }
+
+async def _get_members(member_ids, projection: dict) -> dict:
+    """Members by ID, fetched with one `$in`"""
+    object_ids = [ObjectId(member_id) for member_id in set(member_ids) if ObjectId.is_valid(member_id)]
+    if not object_ids:
+        return {}
+    return {
+        str(member["_id"]): member
+        async for member in members_collection.find({"_id": {"$in": object_ids}}, projection)
+    }
+
+async def _with_overdue_details(overdue: list, current_date: datetime, contact: bool = False) -> list:
+    """Add fines and member/book details to a batch of overdue loans
+    
+    Members and books for the whole batch are resolved with one batched
+    lookup each (books through the book cache). With `contact` the member's
+    name and email are included for overdue notices, at the cost of one
+    more `$in` on users.
+    """
+    projection = {"membership_id": 1, "user_id": 1, "phone": 1} if contact else {"membership_id": 1}
+    members, books = await asyncio.gather(
+        _get_members((transaction["member_id"] for transaction in overdue), projection),
+        get_cached_books(transaction["book_id"] for transaction in overdue)
+    )
+    
+    users = {}
+    if contact:
+        user_ids = [ObjectId(member["user_id"]) for member in members.values() if ObjectId.is_valid(member.get("user_id"))]
+        if user_ids:
+            async for user in users_collection.find({"_id": {"$in": user_ids}}, {"full_name": 1, "email": 1}):
+                users[str(user["_id"])] = user
     
     transactions = []
-    cursor = transactions_collection.find(query).sort("due_date", 1)
-    async for transaction in cursor:
-        # Get member and book details
-        member = await members_collection.find_one({"_id": ObjectId(transaction["member_id"])})
-        book = await books_collection.find_one({"_id": ObjectId(transaction["book_id"])})
-        
-        # Calculate current fine
-        current_fine = calculate_fine(transaction["due_date"], current_date)
+    for transaction in overdue:
+        member = members.get(transaction["member_id"])
+        book = books.get(transaction["book_id"])
         
         transaction["id"] = str(transaction.pop("_id"))
-        transaction["current_fine"] = current_fine
+        transaction["current_fine"] = calculate_fine(transaction["due_date"], current_date)
         transaction["days_overdue"] = (current_date - transaction["due_date"]).days
         
         if member:
             transaction["member_details"] = {
                 "membership_id": member["membership_id"]
             }
+            if contact:
+                user = users.get(member.get("user_id"), {})
+                transaction["member_details"].update(
+                    full_name=user.get("full_name"),
+                    email=user.get("email"),
+                    phone=member.get("phone")
+                )
         if book:
             transaction["book_details"] = {
                 "title": book["title"],
@@ -203,27 +667,107 @@ async def get_overdue_transactions():
             }
         
         transactions.append(transaction)
+    return transactions
+
+async def get_overdue_transactions(
+    page: int = 1,
+    page_size: int = None,
+    cursor: str = None,
+    count_strategy: str = "exact",
+    include_total: bool = True
+):
+    """Get overdue transactions, longest overdue first
+    
+    Passing `cursor` (an empty string for the first page) switches to keyset
+    pagination on `(due_date, _id)`, so deep pages cost the same as the
+    first one. Member and book details come from one lookup each per page.
+    """
+    if page_size is None:
+        page_size = settings.DEFAULT_PAGE_SIZE
+    
+    page_size = min(page_size, settings.MAX_PAGE_SIZE)
+    skip = (page - 1) * page_size
+    current_date = datetime.utcnow()
+    # Whole-minute cutoff so equal filters share a cached count across requests
+    query = _overdue_query(current_date.replace(second=0, microsecond=0))
+    
+    if cursor is not None:
+        page_cursor = transactions_collection.find(seek_sorted_query(query, "due_date", cursor))
+        overdue = await page_cursor.sort([("due_date", 1), ("_id", 1)]).limit(page_size + 1).to_list(length=page_size + 1)
+        has_more = len(overdue) > page_size
+        overdue = overdue[:page_size]
+        next_cursor = encode_sort_cursor(overdue[-1]["due_date"], overdue[-1]["_id"]) if has_more else None
+        
+        return {
+            "overdue_transactions": await _with_overdue_details(overdue, current_date),
+            "page_size": page_size,
+            "next_cursor": next_cursor,
+            "has_more": has_more
+        }
+    
+    total, count_used = await count_total(transactions_collection, query, count_strategy, include_total)
+    
+    limit = page_size if total is not None else page_size + 1
+    overdue = await transactions_collection.find(query).sort([("due_date", 1), ("_id", 1)]).skip(skip).limit(limit).to_list(length=limit)
+    overdue, has_more = trim_page(overdue, page_size, skip, total)
     
     return {
-        "overdue_transactions": transactions,
-        "total": len(transactions)
+        "overdue_transactions": await _with_overdue_details(overdue, current_date),
+        "total": total,
+        "page": page,
+        "page_size": page_size,
+        "total_pages": total_pages(total, page_size),
+        "has_more": has_more,
+        "count_strategy": count_used
     }
 
-async def search_available_books(search: str = None, category: str = None):
+def _ndjson(rows: list) -> str:
+    return "".join(json.dumps(row, default=json_default) + "\n" for row in rows)
+
+async def export_overdue_transactions():
+    """Stream every overdue loan as NDJSON, with contact details for notices
+    
+    Loans are read in batches of EXPORT_BATCH_SIZE; each batch's members,
+    users and books are resolved together and written out before the next
+    batch is read, so memory use does not grow with the number of loans.
+    """
+    current_date = datetime.utcnow()
+    cursor = transactions_collection.find(_overdue_query(current_date)).sort([("due_date", 1), ("_id", 1)])
+    cursor = cursor.batch_size(settings.EXPORT_BATCH_SIZE)
+    
+    batch = []
+    async for transaction in cursor:
+        batch.append(transaction)
+        if len(batch) == settings.EXPORT_BATCH_SIZE:
+            yield _ndjson(await _with_overdue_details(batch, current_date, contact=True))
+            batch = []
+    
+    if batch:
+        yield _ndjson(await _with_overdue_details(batch, current_date, contact=True))
+
+async def search_available_books(
+    search: str = None,
+    category: str = None,
+    fields: str = None,
+    search_mode: str = "regex"
+):
     """Search for available books"""
     query = {"available_copies": {"$gt": 0}}
+    projection = build_projection(fields, BOOK_LIST_FIELDS) or dict(HIDDEN_FIELDS)
     
-    if search:
-        query["$or"] = [
-            {"title": {"$regex": search, "$options": "i"}},
-            {"author": {"$regex": search, "$options": "i"}}
-        ]
+    if search and search_mode == "text":
+        query["$text"] = {"$search": search}
+        projection = with_text_score(projection)
+    elif search:
+        query["$or"] = match_any(["title", "author"], search, search_mode)
     
     if category:
         query["category"] = category
     
     books = []
-    cursor = books_collection.find(query)
+    cursor = time_limited(books_collection.find(query, projection))
+    if "$text" in query:
+        cursor = cursor.sort(TEXT_SCORE_SORT)
     async for book in cursor:
         book["id"] = str(book.pop("_id"))
         books.append(book)
@@ -233,6 +777,16 @@ async def search_available_books(search: str = None, category: str = None):
         "total": len(books)
     }
 
+async def _pending_fines_total(member_id: str) -> float:
+    """Sum of a member's pending fines"""
+    pipeline = [
+        {"$match": {"member_id": member_id, "status": "pending"}},
+        {"$group": {"_id": None, "total": {"$sum": "$amount"}}}
+    ]
+    async for result in fines_collection.aggregate(pipeline):
+        return float(result["total"])
+    return 0.0
+
 async def check_member_eligibility(member_id: str):
     """Check if member is eligible to borrow books"""
     if not ObjectId.is_valid(member_id):
@@ -249,6 +803,19 @@ async def check_member_eligibility(member_id: str):
             detail="Member not found"
         )
     
+    if has_counters(member):
+        current_borrowed = member["current_borrowed"]
+        total_pending_fines = round(member["pending_fine_total"], 2)
+    else:
+        # Counters not reconciled yet: count from the source collections
+        current_borrowed, total_pending_fines = await asyncio.gather(
+            transactions_collection.count_documents({
+                "member_id": member_id,
+                "status": "borrowed"
+            }),
+            _pending_fines_total(member_id)
+        )
+    
     # Check if member is active
     if not member.get("is_active", False):
         return {
@@ -271,12 +838,6 @@ async def check_member_eligibility(member_id: str):
             "pending_fines": 0.0
         }
     
-    # Count current borrowed books
-    current_borrowed = await transactions_collection.count_documents({
-        "member_id": member_id,
-        "status": "borrowed"
-    })
-    
     # Check book limit
     if current_borrowed >= member["max_books_allowed"]:
         return {
@@ -289,15 +850,6 @@ async def check_member_eligibility(member_id: str):
         }
     
     # Check pending fines
-    pending_fines_cursor = fines_collection.find({
-        "member_id": member_id,
-        "status": "pending"
-    })
-    
-    total_pending_fines = 0.0
-    async for fine in pending_fines_cursor:
-        total_pending_fines += fine["amount"]
-    
     if total_pending_fines > 0:
         return {
             "member_id": member_id,
@@ -19,11 +19,56 @@ class Settings(BaseSettings):
     # Pagination
     DEFAULT_PAGE_SIZE: int = 20
     MAX_PAGE_SIZE: int = 100
+    COUNT_CACHE_TTL_SECONDS: int = 30  # Reuse filtered counts for this long
+    COUNT_CACHE_MAX_ENTRIES: int = 1024
+    BULK_BATCH_SIZE: int = 1000  # Rows per insert_many in bulk ingestion
+    EXPORT_BATCH_SIZE: int = 1000  # Cursor batch size for catalog export
+    MAX_BATCH_LOOKUP: int = 500  # IDs/ISBNs accepted by batch lookups
+    TEXT_INDEX_INCLUDE_DESCRIPTION: bool = False  # Used by init_db.py when creating the text index
+    QUERY_MAX_TIME_MS: int = 5000  # Server-side time limit for search queries
+    MAX_SEARCH_TERM_LENGTH: int = 200
+    
+    # In-process book cache
+    BOOK_CACHE_MAX_SIZE: int = 10000
+    BOOK_CACHE_TTL_SECONDS: int = 300
+    AUTOCOMPLETE_CACHE_DEPTH: int = 50  # Ranked completions kept per cached prefix
+    AUTOCOMPLETE_CACHE_MAX_PREFIXES: int = 10000
+    AUTOCOMPLETE_PRECOMPUTED_PREFIX_LENGTH: int = 3  # Prefixes up to this length are ranked at build time
     
     # Fine Calculation
     FINE_PER_DAY: float = 5.0  # Fine amount per day overdue
     MAX_BOOKS_PER_MEMBER: int = 5
     LOAN_PERIOD_DAYS: int = 14
+    BORROW_USE_TRANSACTIONS: bool = True  # Used only when the server is a replica set or mongos
+    
+    # Cover images
+    COVER_UPLOAD_DIR: str = "uploads/covers"
+    COVER_MAX_BYTES: int = 10 * 1024 * 1024  # 10 MB
+    COVER_THUMBNAIL_WORKERS: int = 2
+    
+    # Co-borrow recommendations
+    RECOMMENDATION_NEIGHBORS: int = 50  # Similar books kept per book
+    RECOMMENDATION_HISTORY_LIMIT: int = 200  # Most recent books per member used for pairs and scoring
+    RECOMMENDATION_CACHE_MAX_SIZE: int = 10000  # Members with a cached list
+    RECOMMENDATION_CACHE_TTL_SECONDS: int = 900
+    RECOMMENDATION_PREWARM_MEMBERS: int = 500  # Recently active members cached at startup
+    RECOMMENDATION_PREWARM_SCAN: int = 5000  # Latest transactions scanned to find them
+    
+    # Popularity rankings
+    POPULARITY_RANKING_SIZE: int = 50  # Books kept per cached ranking (max `limit`)
+    POPULARITY_CACHE_TTL_SECONDS: int = 60
+    
+    # BM25 search index
+    BM25_STOPWORD_DF_RATIO: float = 0.5  # Terms in more of the catalog than this are skipped in mixed queries
+    
+    # Typo-tolerant (trigram) search
+    FUZZY_THRESHOLD: float = 0.3  # Minimum trigram similarity, 0-1
+    FUZZY_MAX_MATCHES: int = 50  # Similar values considered per lookup
+    
+    # Vector similarity index (built offline by build_vector_index.py)
+    VECTOR_INDEX_DIR: str = "data/vector_index"
+    VECTOR_DIMENSIONS: int = 1024  # Hashed feature columns per book
+    VECTOR_BUILD_CHUNK_SIZE: int = 2000  # Books per worker task during a build
     
     # AI Settings (optional)
     OPENAI_API_KEY: str = ""
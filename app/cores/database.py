@@ -9,8 +9,11 @@ db = client["Library_Management_System"]
 # Collections
 users_collection = db["users"]
 books_collection = db["books"]
+book_facets_collection = db["book_facets"]
 members_collection = db["members"]
 transactions_collection = db["transactions"]
+book_popularity_collection = db["book_popularity"]
+book_popularity_daily_collection = db["book_popularity_daily"]
 fines_collection = db["fines"]
 reservations_collection = db["reservations"]
 ebooks_collection = db["ebooks"]
@@ -1,5 +1,12 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, status
+from fastapi.responses import JSONResponse
+from pymongo.errors import ExecutionTimeout
 from fastapi.middleware.cors import CORSMiddleware
+from app.utils.search_index import ensure_search_index
+from app.utils.autocomplete import ensure_autocomplete
+from app.utils.fuzzy_index import ensure_fuzzy_indexes
+from app.controllers.search_controller import prewarm_recommendations
+import asyncio
 from app.routers import (
     auth_routes, book_routes, member_routes, transaction_routes,
     fine_routes, reservation_routes, search_routes, ebook_routes,
@@ -34,6 +41,25 @@ app.include_router(report_routes.router)
 app.include_router(system_routes.router)
 app.include_router(ai_routes.router)
 
+@app.exception_handler(ExecutionTimeout)
+async def query_timeout_handler(request: Request, exc: ExecutionTimeout):
+    """Searches that exceed QUERY_MAX_TIME_MS are reported instead of failing with 500"""
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Query took too long; try a more specific search"}
+    )
+
+# Background tasks started at startup (kept referenced so they are not collected)
+background_tasks = set()
+
+@app.on_event("startup")
+async def warm_in_memory_indexes():
+    """Build in-process search structures in the background"""
+    for build in (ensure_search_index, ensure_autocomplete, ensure_fuzzy_indexes, prewarm_recommendations):
+        task = asyncio.create_task(build())
+        background_tasks.add(task)
+        task.add_done_callback(background_tasks.discard)
+
 @app.get("/")
 def root():
     return {
@@ -1,9 +1,15 @@
-from fastapi import APIRouter, Query, Depends, File, UploadFile, Form
+from fastapi import APIRouter, Query, Depends, File, UploadFile, Form, Request, Response, HTTPException, status
+from fastapi.responses import StreamingResponse, FileResponse
 from app.controllers.book_controller import (
-    add_book, get_books, get_book_by_id, update_book, delete_book,
-    get_categories, get_authors, check_availability, upload_book_with_image
+    add_book, bulk_add_books, iter_ndjson, get_books, build_book_query, open_book_export, export_books,
+    get_book_by_id, update_book, delete_book,
+    get_categories, get_authors, check_availability, check_availability_batch,
+    upload_book_with_image
 )
-from app.schemas.book_schema import BookCreate, BookUpdate
+from app.utils.facets import rebuild_facets
+from app.utils.covers import cover_path
+from app.utils.utils import build_projection, book_etag, list_etag, etag_matches, http_date
+from app.schemas.book_schema import BookCreate, BookUpdate, BatchAvailabilityRequest
 from app.utils.auth import librarian_required, get_current_user
 from typing import Optional
 
@@ -11,40 +17,148 @@ router = APIRouter(prefix="/books", tags=["Books"])
 
 @router.get("/")
 async def list_books(
+    request: Request,
+    response: Response,
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
     category: Optional[str] = None,
     author: Optional[str] = None,
-    search: Optional[str] = None
+    search: Optional[str] = None,
+    cursor: Optional[str] = Query(None, description="Opaque cursor for keyset paging; pass an empty value for the first page"),
+    count_strategy: str = Query("exact", pattern="^(exact|estimated|cached)$"),
+    include_total: bool = True,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, or 'all'"),
+    search_mode: str = Query("regex", pattern="^(regex|prefix|text|fuzzy)$")
 ):
     """List all books with pagination and filters"""
-    return await get_books(page, page_size, category, author, search)
+    result = await get_books(
+        page, page_size, category, author, search, cursor,
+        count_strategy, include_total, fields, search_mode
+    )
+    
+    etag = list_etag(result["books"], result.get("total"), result.get("next_cursor"), str(request.query_params))
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    
+    response.headers["ETag"] = etag
+    return result
+
+@router.get("/export", dependencies=[Depends(librarian_required)])
+async def export_catalog(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    category: Optional[str] = None,
+    author: Optional[str] = None,
+    search: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to export, or 'all'"),
+    search_mode: str = Query("regex", pattern="^(regex|prefix|text|fuzzy)$")
+):
+    """Stream the whole catalog as NDJSON or CSV (librarian/admin only)"""
+    # Validate everything before the 200 headers go out with the first chunk
+    query = await build_book_query(category, author, search, search_mode)
+    projection = build_projection(fields)
+    cursor, first_batch = await open_book_export(query, projection)
+    
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        export_books(cursor, first_batch, projection, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename=books.{format}"}
+    )
 
 @router.get("/categories")
-async def fetch_categories():
-    """Get all book categories"""
-    return await get_categories()
+async def fetch_categories(
+    prefix: Optional[str] = None,
+    page: int = Query(1, ge=1),
+    page_size: int = Query(100, ge=1, le=100)
+):
+    """Get book categories with book and availability counts"""
+    return await get_categories(prefix, page, page_size)
 
 @router.get("/authors")
-async def fetch_authors():
-    """Get all authors"""
-    return await get_authors()
+async def fetch_authors(
+    prefix: Optional[str] = None,
+    page: int = Query(1, ge=1),
+    page_size: int = Query(100, ge=1, le=100)
+):
+    """Get authors with book and availability counts"""
+    return await get_authors(prefix, page, page_size)
+
+@router.post("/facets/rebuild", dependencies=[Depends(librarian_required)])
+async def rebuild_book_facets():
+    """Rebuild category/author facet counts from the catalog (librarian/admin only)"""
+    total = await rebuild_facets()
+    return {"message": "Facets rebuilt successfully", "total_facets": total}
+
+@router.post("/availability")
+async def get_availability_batch(request: BatchAvailabilityRequest):
+    """Check availability of up to MAX_BATCH_LOOKUP books by ID or ISBN"""
+    return await check_availability_batch(request)
+
+@router.get("/covers/{name}")
+async def get_cover(name: str, size: str = Query("original", pattern="^(original|list|detail)$")):
+    """Serve a cover image or one of its thumbnails"""
+    return FileResponse(
+        cover_path(name, size),
+        headers={"Cache-Control": "public, max-age=31536000, immutable"}
+    )
+
+def _not_modified(request: Request, response: Response, book_id: str, book: dict):
+    """Set a book's validators, answering 304 if the client already has it
+    
+    The ETag comes from the same document as the body, so a client is
+    never told its copy is current unless it matches what would be sent.
+    """
+    headers = {"ETag": book_etag(book_id, book.get("version", 0))}
+    last_modified = book.get("updated_at") or book.get("created_at")
+    if last_modified:
+        headers["Last-Modified"] = http_date(last_modified)
+    
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+    return None
 
 @router.get("/{book_id}")
-async def get_book(book_id: str):
-    """Get a single book by ID"""
-    return await get_book_by_id(book_id)
+async def get_book(book_id: str, request: Request, response: Response):
+    """Get a single book by ID (supports If-None-Match)"""
+    book = await get_book_by_id(book_id)
+    not_modified = _not_modified(request, response, book_id, book)
+    if not_modified:
+        return not_modified
+    return book
 
 @router.get("/{book_id}/availability")
-async def get_availability(book_id: str):
-    """Check book availability"""
-    return await check_availability(book_id)
+async def get_availability(book_id: str, request: Request, response: Response):
+    """Check book availability (supports If-None-Match)"""
+    availability = await check_availability(book_id)
+    not_modified = _not_modified(request, response, book_id, availability)
+    if not_modified:
+        return not_modified
+    return availability
 
 @router.post("/", dependencies=[Depends(librarian_required)])
 async def create_book(book: BookCreate):
     """Add a new book (librarian/admin only)"""
     return await add_book(book)
 
+@router.post("/bulk", dependencies=[Depends(librarian_required)])
+async def create_books_bulk(request: Request):
+    """Add many books at once (librarian/admin only)
+    
+    Send a JSON array of books, or an NDJSON stream (one book per line)
+    with `Content-Type: application/x-ndjson`. Returns a per-row report.
+    """
+    if "ndjson" in request.headers.get("content-type", ""):
+        return await bulk_add_books(iter_ndjson(request.stream()))
+    
+    payload = await request.json()
+    if not isinstance(payload, list):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Expected a JSON array of books"
+        )
+    return await bulk_add_books(payload)
+
 @router.post("/upload", dependencies=[Depends(librarian_required)])
 async def upload_book(
     title: str = Form(...),
@@ -5,6 +5,7 @@ from app.controllers.report_controller import (
 )
 from app.schemas.report_schema import ReportRequest
 from app.utils.auth import librarian_required
+from app.utils.popularity import rebuild_popularity
 from datetime import datetime
 from typing import Optional
 
@@ -27,9 +28,17 @@ async def get_fines_report(
     return await fines_report(start_date, end_date)
 
 @router.get("/popular-books", dependencies=[Depends(librarian_required)])
-async def get_popular_books(limit: int = Query(10, ge=1, le=50)):
-    """Generate popular books report"""
-    return await popular_books_report(limit)
+async def get_popular_books(
+    limit: int = Query(10, ge=1, le=50),
+    window: str = Query("all", pattern="^(all|7d|30d)$")
+):
+    """Generate popular books report (all time, last 7 days or last 30 days)"""
+    return await popular_books_report(limit, window)
+
+@router.post("/popular-books/rebuild", dependencies=[Depends(librarian_required)])
+async def rebuild_popular_books():
+    """Recompute popularity counters from transaction history (librarian/admin only)"""
+    return {"message": "Popularity counters rebuilt", **await rebuild_popularity()}
 
 @router.post("/custom", dependencies=[Depends(librarian_required)])
 async def create_custom_report(report_params: dict):
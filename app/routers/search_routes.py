@@ -1,15 +1,24 @@
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Query, Depends
 from app.controllers.search_controller import (
-    advanced_search, get_suggestions, get_ai_recommendations, semantic_search
+    advanced_search, get_suggestions, get_ai_recommendations, semantic_search, get_fuzzy_matches
 )
 from app.schemas.search_schema import AdvancedSearchRequest
+from app.utils.search_index import rebuild_search_index
+from app.utils.autocomplete import rebuild_autocomplete
+from app.utils.fuzzy_index import rebuild_fuzzy_indexes
+from app.utils.recommender import rebuild_co_borrow_model
+from app.utils.auth import librarian_required
+from typing import Optional
 
 router = APIRouter(prefix="/search", tags=["Search"])
 
 @router.post("/advanced")
-async def perform_advanced_search(search_params: AdvancedSearchRequest):
+async def perform_advanced_search(
+    search_params: AdvancedSearchRequest,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, or 'all'")
+):
     """Advanced search with multiple filters"""
-    return await advanced_search(search_params)
+    return await advanced_search(search_params, fields)
 
 @router.get("/suggestions")
 async def get_search_suggestions(
@@ -19,12 +28,37 @@ async def get_search_suggestions(
     """Get autocomplete suggestions"""
     return await get_suggestions(q, type)
 
+@router.get("/fuzzy")
+async def get_fuzzy_search_matches(
+    q: str = Query(..., min_length=2),
+    type: str = Query("all", pattern="^(all|titles|authors)$"),
+    threshold: Optional[float] = Query(None, ge=0, le=1)
+):
+    """Typo-tolerant title and author lookup ranked by trigram similarity"""
+    return await get_fuzzy_matches(q, type, threshold)
+
 @router.get("/recommendations/{member_id}")
 async def get_recommendations(member_id: str):
     """Get personalized book recommendations"""
     return await get_ai_recommendations(member_id)
 
 @router.post("/semantic")
-async def perform_semantic_search(query: str = Query(..., min_length=3)):
-    """Semantic search across all book fields"""
-    return await semantic_search(query)
+async def perform_semantic_search(
+    query: str = Query(..., min_length=3),
+    limit: int = Query(20, ge=1, le=100),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, or 'all'"),
+    method: str = Query("bm25", pattern="^(bm25|vector)$")
+):
+    """Full-text search across all book fields, ranked by relevance"""
+    return await semantic_search(query, fields, limit, method)
+
+@router.post("/reindex", dependencies=[Depends(librarian_required)])
+async def reindex_catalog():
+    """Rebuild the in-memory search indexes and recommendation model (librarian/admin only)"""
+    return {
+        "message": "Search index rebuilt",
+        "index": await rebuild_search_index(),
+        "autocomplete": await rebuild_autocomplete(),
+        "fuzzy": await rebuild_fuzzy_indexes(),
+        "recommendations": await rebuild_co_borrow_model()
+    }
@@ -4,6 +4,14 @@ from app.controllers.system_controller import (
 )
 from app.schemas.system_schema import SettingUpdate, StaffCreate
 from app.utils.auth import admin_required, librarian_required
+from app.utils.book_cache import book_cache
+from app.utils.search_index import search_index
+from app.utils.autocomplete import autocomplete
+from app.utils.vector_index import vector_index
+from app.utils.fuzzy_index import fuzzy_indexes
+from app.utils.recommender import co_borrow_model
+from app.utils.recommendation_cache import recommendation_cache
+from app.utils.member_counters import reconcile_member_counters
 
 router = APIRouter(prefix="/system", tags=["System"])
 
@@ -22,6 +30,24 @@ async def check_health():
     """Check system health and database connectivity"""
     return await health_check()
 
+@router.get("/cache-stats", dependencies=[Depends(admin_required)])
+async def get_cache_stats():
+    """In-process book cache and search index statistics (admin only)"""
+    return {
+        "book_cache": book_cache.stats(),
+        "search_index": search_index.stats(),
+        "autocomplete": autocomplete.stats(),
+        "vector_index": vector_index.stats(),
+        "fuzzy_indexes": {name: index.stats() for name, index in fuzzy_indexes.items()},
+        "co_borrow_model": co_borrow_model.stats(),
+        "recommendation_cache": recommendation_cache.stats()
+    }
+
+@router.post("/member-counters/reconcile", dependencies=[Depends(admin_required)])
+async def reconcile_counters(fix: bool = True):
+    """Rebuild members' loan and fine counters and report drift (admin only)"""
+    return await reconcile_member_counters(fix)
+
 @router.get("/staff", dependencies=[Depends(admin_required)])
 async def fetch_staff():
     """List all staff members (admin only)"""
@@ -1,9 +1,10 @@
 from fastapi import APIRouter, Query, Depends
+from fastapi.responses import StreamingResponse
 from app.controllers.transaction_controller import (
-    borrow_book, return_book, get_transaction_history,
-    get_overdue_transactions, search_available_books, check_member_eligibility
+    borrow_book, borrow_books_batch, return_book, return_books_batch, get_transaction_history,
+    get_overdue_transactions, export_overdue_transactions, search_available_books, check_member_eligibility
 )
-from app.schemas.transaction_schema import BorrowRequest, ReturnRequest
+from app.schemas.transaction_schema import BorrowRequest, BatchBorrowRequest, ReturnRequest, BatchReturnRequest
 from app.utils.auth import librarian_required, member_required
 from typing import Optional
 
@@ -14,32 +15,63 @@ async def borrow(borrow_data: BorrowRequest):
     """Borrow a book (librarian/admin only)"""
     return await borrow_book(borrow_data)
 
+@router.post("/borrow/batch", dependencies=[Depends(librarian_required)])
+async def borrow_batch(request: BatchBorrowRequest):
+    """Check out several books to one member at once (librarian/admin only)"""
+    return await borrow_books_batch(request)
+
 @router.post("/return", dependencies=[Depends(librarian_required)])
 async def return_borrowed_book(return_data: ReturnRequest):
     """Return a borrowed book (librarian/admin only)"""
     return await return_book(return_data)
 
+@router.post("/return/batch", dependencies=[Depends(librarian_required)])
+async def return_batch(request: BatchReturnRequest):
+    """Return many books at once, e.g. from the book drop (librarian/admin only)"""
+    return await return_books_batch(request)
+
 @router.get("/history", dependencies=[Depends(member_required)])
 async def get_history(
     member_id: Optional[str] = None,
     page: int = Query(1, ge=1),
-    page_size: int = Query(20, ge=1, le=100)
+    page_size: int = Query(20, ge=1, le=100),
+    count_strategy: str = Query("exact", pattern="^(exact|estimated|cached)$"),
+    include_total: bool = True
 ):
     """Get transaction history"""
-    return await get_transaction_history(member_id, page, page_size)
+    return await get_transaction_history(
+        member_id, page, page_size, count_strategy, include_total
+    )
 
 @router.get("/overdue", dependencies=[Depends(librarian_required)])
-async def get_overdue():
-    """Get all overdue transactions (librarian/admin only)"""
-    return await get_overdue_transactions()
+async def get_overdue(
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Opaque cursor for keyset paging; pass an empty value for the first page"),
+    count_strategy: str = Query("exact", pattern="^(exact|estimated|cached)$"),
+    include_total: bool = True
+):
+    """Get overdue transactions, longest overdue first (librarian/admin only)"""
+    return await get_overdue_transactions(page, page_size, cursor, count_strategy, include_total)
+
+@router.get("/overdue/export", dependencies=[Depends(librarian_required)])
+async def export_overdue():
+    """Stream all overdue loans with member contact details as NDJSON (librarian/admin only)"""
+    return StreamingResponse(
+        export_overdue_transactions(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": "attachment; filename=overdue.ndjson"}
+    )
 
 @router.get("/available-books")
 async def get_available_books(
     search: Optional[str] = None,
-    category: Optional[str] = None
+    category: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, or 'all'"),
+    search_mode: str = Query("regex", pattern="^(regex|prefix|text)$")
 ):
     """Search available books for borrowing"""
-    return await search_available_books(search, category)
+    return await search_available_books(search, category, fields, search_mode)
 
 @router.get("/eligibility/{member_id}", dependencies=[Depends(librarian_required)])
 async def get_eligibility(member_id: str):
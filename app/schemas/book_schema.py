@@ -1,7 +1,16 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Optional, List
 from datetime import datetime
 
+# Fields returned by list views when no `fields` parameter is given
+BOOK_LIST_FIELDS = [
+    "title", "author", "isbn", "category", "publisher", "publication_year",
+    "total_copies", "available_copies", "cover_image"
+]
+
+# Columns written by the CSV catalog export when no `fields` are given
+BOOK_EXPORT_FIELDS = BOOK_LIST_FIELDS + ["description", "created_at"]
+
 class BookCreate(BaseModel):
     title: str
     author: str
@@ -52,6 +61,10 @@ class CategoryResponse(BaseModel):
 class AuthorResponse(BaseModel):
     authors: list[str]
 
+class BatchAvailabilityRequest(BaseModel):
+    book_ids: List[str] = []
+    isbns: List[str] = []
+
 class AvailabilityResponse(BaseModel):
     book_id: str
     title: str
@@ -1,7 +1,9 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional, List
 
 class AdvancedSearchRequest(BaseModel):
+    query: Optional[str] = None  # Free text over title, author and category
+    search_mode: str = Field("regex", pattern="^(regex|prefix|text|fuzzy)$")  # regex (substring), prefix, text (text index) or fuzzy (trigram similarity)
     title: Optional[str] = None
     author: Optional[str] = None
     category: Optional[str] = None
@@ -9,6 +11,11 @@ class AdvancedSearchRequest(BaseModel):
     publication_year_min: Optional[int] = None
     publication_year_max: Optional[int] = None
     available_only: bool = False
+    page: int = Field(1, ge=1)
+    page_size: Optional[int] = Field(None, ge=1)
+    sort_by: str = Field("relevance", pattern="^(relevance|title|author|publication_year|available_copies|created_at)$")
+    sort_order: str = Field("asc", pattern="^(asc|desc)$")
+    include_facets: bool = True  # Counts by category, decade and availability
 
 class SearchSuggestion(BaseModel):
     suggestions: List[str]
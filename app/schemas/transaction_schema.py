@@ -1,14 +1,23 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
 class BorrowRequest(BaseModel):
     member_id: str
     book_id: str
 
+class BatchBorrowRequest(BaseModel):
+    member_id: str
+    book_ids: List[str] = []
+    isbns: List[str] = []
+
 class ReturnRequest(BaseModel):
     transaction_id: str
 
+class BatchReturnRequest(BaseModel):
+    transaction_ids: List[str] = []
+    isbns: List[str] = []  # Scanned book barcodes
+
 class TransactionResponse(BaseModel):
     id: str
     member_id: str
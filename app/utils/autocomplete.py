@@ -0,0 +1,257 @@
+from app.cores.database import books_collection, transactions_collection
+from app.cores.config import settings
+from app.utils.live_index import LiveIndex
+from collections import defaultdict
+import bisect
+import heapq
+import itertools
+
+# Book field behind each suggestion type
+SUGGESTION_FIELDS = {
+    "titles": "title",
+    "authors": "author",
+    "categories": "category"
+}
+
+class _Ranking:
+    """Highest weighted completions of one prefix and type, kept in place
+    
+    `entries` holds `(-weight, key)` pairs in rank order, at most
+    AUTOCOMPLETE_CACHE_DEPTH of them. `floor` bounds the weight of every
+    completion left out (0 when none are), so the entries are exact as long
+    as there are enough of them to answer a query.
+    """
+
+    def __init__(self, entries: list = None, floor: float = 0):
+        self.entries = entries if entries is not None else []
+        self.floor = floor
+
+    def covers(self, limit: int) -> bool:
+        return self.floor == 0 or len(self.entries) >= limit
+
+    def update(self, key: tuple, old: float, new: float):
+        if old > 0:
+            index = bisect.bisect_left(self.entries, (-old, key))
+            if index < len(self.entries) and self.entries[index] == (-old, key):
+                del self.entries[index]
+        # A completion that falls to the floor may now rank below ones left out
+        if new > self.floor:
+            bisect.insort(self.entries, (-new, key))
+            if len(self.entries) > settings.AUTOCOMPLETE_CACHE_DEPTH:
+                self.floor = max(self.floor, -self.entries.pop()[0])
+
+class Autocomplete:
+    """Popularity-weighted prefix completion over a sorted array
+    
+    Keys are `(lowercase value, type, value)` tuples kept sorted, so all
+    completions of a prefix are one contiguous `bisect` range. Each prefix
+    keeps a bounded ranking per type that weight changes update in place;
+    prefixes up to AUTOCOMPLETE_PRECOMPUTED_PREFIX_LENGTH are ranked when
+    the index is built, longer ones on first use.
+    """
+
+    def __init__(self):
+        self.weights = {}
+        self.keys = []
+        self.borrows = {}
+        self._short = {}
+        self._top = {}
+        self.ready = False
+
+    def __len__(self):
+        return len(self.keys)
+
+    def adjust(self, suggestion_type: str, value, delta: float):
+        """Change the weight of one completion, adding or removing it as needed"""
+        if not value or not delta:
+            return
+        value = str(value)
+        key = (value.lower(), suggestion_type, value)
+        
+        old = self.weights.get(key, 0)
+        weight = old + delta
+        if weight > 0:
+            if key not in self.weights:
+                bisect.insort(self.keys, key)
+            self.weights[key] = weight
+        elif key in self.weights:
+            del self.weights[key]
+            index = bisect.bisect_left(self.keys, key)
+            if index < len(self.keys) and self.keys[index] == key:
+                del self.keys[index]
+        self._rerank(key, old, max(weight, 0))
+
+    def _rerank(self, key: tuple, old: float, new: float):
+        # Move the key within every ranking it takes part in
+        short_length = settings.AUTOCOMPLETE_PRECOMPUTED_PREFIX_LENGTH
+        for length in range(1, len(key[0]) + 1):
+            prefix = key[0][:length]
+            if length <= short_length:
+                rankings = self._short.setdefault(prefix, {})
+                ranking = rankings.get(key[1]) or rankings.setdefault(key[1], _Ranking())
+            else:
+                ranking = self._top.get(prefix, {}).get(key[1])
+                if ranking is None:
+                    continue
+            ranking.update(key, old, new)
+
+    def move_book(self, book_id: str, before: tuple, after: tuple):
+        """Move one book's completions from `(book, borrows)` state `before` to `after`
+
+        A book's title, author and category each count once plus once per
+        borrow, so renames and deletes carry its borrows along. Either state
+        may be None (the book is absent).
+        """
+        deltas = defaultdict(int)
+        for state, sign in ((before, -1), (after, 1)):
+            if state is not None:
+                book, borrows = state
+                for suggestion_type, field in SUGGESTION_FIELDS.items():
+                    if book.get(field):
+                        deltas[suggestion_type, book[field]] += sign * (1 + borrows)
+        for (suggestion_type, value), delta in deltas.items():
+            self.adjust(suggestion_type, value, delta)
+        
+        if after is not None and after[1]:
+            self.borrows[book_id] = after[1]
+        else:
+            self.borrows.pop(book_id, None)
+
+    def complete(self, prefix: str, suggestion_types, limit: int = 10) -> list:
+        """Highest weighted `(value, type)` completions of a prefix"""
+        prefix = prefix.lower()
+        if not prefix:
+            return []
+        
+        short = len(prefix) <= settings.AUTOCOMPLETE_PRECOMPUTED_PREFIX_LENGTH
+        if short:
+            # Every short prefix and type in the catalog is ranked up front
+            rankings = self._short.get(prefix)
+            if rankings is None:
+                return []
+        else:
+            rankings = self._top.get(prefix)
+            if rankings is None:
+                if len(self._top) >= settings.AUTOCOMPLETE_CACHE_MAX_PREFIXES:
+                    # Drop the oldest entry (dicts keep insertion order)
+                    self._top.pop(next(iter(self._top)))
+                rankings = self._top[prefix] = {}
+        
+        lists = []
+        for suggestion_type in suggestion_types:
+            ranking = rankings.get(suggestion_type)
+            if ranking is None and short:
+                continue
+            if ranking is None or not ranking.covers(limit):
+                ranking = rankings[suggestion_type] = self._rank(prefix, suggestion_type, limit)
+            lists.append(ranking.entries)
+        return [(key[2], key[1]) for _, key in itertools.islice(heapq.merge(*lists), limit)]
+
+    def _rank(self, prefix: str, suggestion_type: str, limit: int) -> _Ranking:
+        start = bisect.bisect_left(self.keys, (prefix,))
+        end = bisect.bisect_left(self.keys, (prefix + "\uffff",))
+        candidates = (
+            (-self.weights[key], key) for key in itertools.islice(self.keys, start, end)
+            if key[1] == suggestion_type
+        )
+        depth = max(settings.AUTOCOMPLETE_CACHE_DEPTH, limit)
+        entries = heapq.nsmallest(depth + 1, candidates)
+        floor = -entries.pop()[0] if len(entries) > depth else 0
+        return _Ranking(entries, floor)
+
+    def _rank_short_prefixes(self):
+        # Rank the longest short prefixes from the keys, then each shorter one
+        # from its extensions' rankings: their top entries contain its own
+        depth = settings.AUTOCOMPLETE_CACHE_DEPTH
+        short_length = settings.AUTOCOMPLETE_PRECOMPUTED_PREFIX_LENGTH
+        candidates = [defaultdict(list) for _ in range(short_length + 1)]
+        floors = [defaultdict(int) for _ in range(short_length + 1)]
+        for key in self.keys:
+            length = min(len(key[0]), short_length)
+            candidates[length][key[0][:length], key[1]].append((-self.weights[key], key))
+        
+        self._short = {}
+        self._top = {}
+        for length in range(short_length, 0, -1):
+            for (prefix, suggestion_type), entries in candidates[length].items():
+                entries = heapq.nsmallest(depth + 1, entries)
+                floor = floors[length][prefix, suggestion_type]
+                if len(entries) > depth:
+                    floor = max(floor, -entries.pop()[0])
+                self._short.setdefault(prefix, {})[suggestion_type] = _Ranking(entries, floor)
+                
+                parent = (prefix[:-1], suggestion_type)
+                candidates[length - 1][parent].extend(entries)
+                floors[length - 1][parent] = max(floors[length - 1][parent], floor)
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "completions": len(self.keys),
+            "ranked_short_prefixes": len(self._short),
+            "cached_prefixes": len(self._top)
+        }
+
+autocomplete = Autocomplete()
+
+async def _load_autocomplete(fresh: Autocomplete, live: LiveIndex):
+    # Popularity: borrow count per book
+    borrows = {}
+    pipeline = [{"$group": {"_id": "$book_id", "count": {"$sum": 1}}}]
+    async for result in transactions_collection.aggregate(pipeline):
+        borrows[str(result["_id"])] = result["count"]
+    
+    weights = defaultdict(int)
+    projection = {field: 1 for field in SUGGESTION_FIELDS.values()}
+    cursor = books_collection.find({}, projection).batch_size(settings.EXPORT_BATCH_SIZE)
+    async for book in cursor:
+        book_id = str(book["_id"])
+        if not live.should_count(book_id):
+            continue
+        if book_id in borrows:
+            fresh.borrows[book_id] = borrows[book_id]
+        weight = 1 + borrows.get(book_id, 0)
+        for suggestion_type, field in SUGGESTION_FIELDS.items():
+            value = book.get(field)
+            if value:
+                value = str(value)
+                weights[(value.lower(), suggestion_type, value)] += weight
+    
+    # Bulk-load instead of inserting keys one at a time
+    fresh.weights.update(weights)
+    fresh.keys = sorted(weights)
+    fresh._rank_short_prefixes()
+
+_live = LiveIndex(
+    autocomplete,
+    Autocomplete,
+    _load_autocomplete,
+    lambda index, book_id, before, after: index.move_book(book_id, before, after)
+)
+
+async def ensure_autocomplete():
+    """Build the autocomplete index from the catalog on first use"""
+    return await _live.ensure()
+
+async def rebuild_autocomplete():
+    """Rebuild the autocomplete index from scratch"""
+    await _live.rebuild()
+    return autocomplete.stats()
+
+def autocomplete_book_written(book: dict, old_book: dict = None):
+    """Move completion weights from a book's old values to its new ones"""
+    book_id = str(book["_id"])
+    borrows = autocomplete.borrows.get(book_id, 0)
+    before = (old_book, borrows) if old_book is not None else None
+    _live.write(book_id, before, (book, borrows))
+
+def autocomplete_book_deleted(book: dict):
+    """Remove a deleted book's contribution to completion weights"""
+    book_id = str(book["_id"])
+    _live.write(book_id, (book, autocomplete.borrows.get(book_id, 0)), None)
+
+def autocomplete_book_borrowed(book: dict):
+    """Count a borrow towards the popularity of a book's completions"""
+    book_id = str(book["_id"])
+    borrows = autocomplete.borrows.get(book_id, 0)
+    _live.write(book_id, (book, borrows), (book, borrows + 1))
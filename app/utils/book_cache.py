@@ -0,0 +1,130 @@
+from app.cores.database import books_collection
+from app.cores.config import settings
+from app.utils.query_compiler import HIDDEN_FIELDS
+from bson import ObjectId
+from collections import OrderedDict
+import time
+
+class BookCache:
+    """Size-bounded LRU cache of book documents with a per-entry TTL
+    
+    Entries are raw Mongo documents keyed by the book's string ID. Every
+    write path must call `invalidate`; the TTL only bounds staleness across
+    worker processes, which do not share the cache. Reads through the cache
+    take a `generation` before going to the database and pass it to `set`,
+    which skips documents invalidated while they were being read.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._epoch = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, book_id: str):
+        entry = self._entries.get(book_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        
+        book, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._entries[book_id]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        
+        self._entries.move_to_end(book_id)
+        self.hits += 1
+        # Callers rename `_id` in place, so hand out copies
+        return dict(book)
+
+    def generation(self, book_id: str) -> tuple:
+        """Token for a database read of one book that is about to start"""
+        return (self._epoch, self._generations.get(book_id, 0))
+
+    def set(self, book_id: str, book: dict, generation: tuple = None):
+        if generation is not None and generation != self.generation(book_id):
+            # Written since the read started; this copy may be stale
+            return
+        self._entries[book_id] = (dict(book), time.monotonic() + self.ttl_seconds)
+        self._entries.move_to_end(book_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, book_id: str):
+        book_id = str(book_id)
+        self._generations[book_id] = self._generations.get(book_id, 0) + 1
+        if len(self._generations) > self.max_size:
+            # Forget per-book counters; a new epoch still fails reads in flight
+            self._generations.clear()
+            self._epoch += 1
+        if self._entries.pop(book_id, None) is not None:
+            self.invalidations += 1
+
+    def clear(self):
+        self._entries.clear()
+        self._generations.clear()
+        self._epoch += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations
+        }
+
+book_cache = BookCache(settings.BOOK_CACHE_MAX_SIZE, settings.BOOK_CACHE_TTL_SECONDS)
+
+async def get_cached_book(book_id: str):
+    """Read one book through the cache (None if it does not exist)"""
+    book_id = str(book_id)
+    book = book_cache.get(book_id)
+    if book is not None:
+        return book
+    
+    if not ObjectId.is_valid(book_id):
+        return None
+    
+    generation = book_cache.generation(book_id)
+    book = await books_collection.find_one({"_id": ObjectId(book_id)}, HIDDEN_FIELDS)
+    if book is not None:
+        book_cache.set(book_id, book, generation)
+    return book
+
+async def get_cached_books(book_ids) -> dict:
+    """Read many books through the cache, fetching all misses with one `$in`
+    
+    Returns a dict of book ID -> document; missing books are left out.
+    """
+    books = {}
+    generations = {}
+    for book_id in {str(book_id) for book_id in book_ids}:
+        book = book_cache.get(book_id)
+        if book is not None:
+            books[book_id] = book
+        elif ObjectId.is_valid(book_id):
+            generations[book_id] = book_cache.generation(book_id)
+    
+    if generations:
+        missing = [ObjectId(book_id) for book_id in generations]
+        async for book in books_collection.find({"_id": {"$in": missing}}, HIDDEN_FIELDS):
+            book_id = str(book["_id"])
+            book_cache.set(book_id, book, generations[book_id])
+            books[book_id] = dict(book)
+    
+    return books
@@ -0,0 +1,142 @@
+from app.cores.config import settings
+from fastapi import HTTPException, status, UploadFile
+from starlette.concurrency import run_in_threadpool
+from concurrent.futures import ProcessPoolExecutor
+import asyncio
+import hashlib
+import os
+import re
+import tempfile
+
+# Thumbnail bounding boxes (width, height) generated for every cover
+THUMBNAIL_SIZES = {
+    "list": (160, 240),
+    "detail": (400, 600)
+}
+
+ALLOWED_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".gif"}
+ALLOWED_FORMATS = {"JPEG", "PNG", "WEBP", "GIF"}
+CHUNK_SIZE = 1024 * 1024
+
+# Covers are stored as <sha256><ext>, thumbnails as <sha256>_<size>.jpg
+COVER_NAME = re.compile(r"^[0-9a-f]{64}\.(jpg|jpeg|png|webp|gif)$")
+
+_thumbnail_pool = None
+
+def _get_thumbnail_pool() -> ProcessPoolExecutor:
+    global _thumbnail_pool
+    if _thumbnail_pool is None:
+        _thumbnail_pool = ProcessPoolExecutor(max_workers=settings.COVER_THUMBNAIL_WORKERS)
+    return _thumbnail_pool
+
+def cover_url(name: str) -> str:
+    """Public URL of a stored cover"""
+    return f"/books/covers/{name}"
+
+def _is_image(path: str) -> bool:
+    """Whether a file is an intact image in one of the allowed formats"""
+    from PIL import Image
+
+    try:
+        with Image.open(path) as image:
+            if image.format not in ALLOWED_FORMATS:
+                return False
+            image.verify()
+    except Exception:
+        return False
+    return True
+
+def _make_thumbnails(path: str, digest: str, directory: str):
+    """Write JPEG thumbnails for one cover (runs in a worker process)"""
+    from PIL import Image, ImageOps
+
+    with Image.open(path) as image:
+        image = ImageOps.exif_transpose(image).convert("RGB")
+        for size_name, size in THUMBNAIL_SIZES.items():
+            target = os.path.join(directory, f"{digest}_{size_name}.jpg")
+            if os.path.exists(target):
+                continue
+            thumbnail = image.copy()
+            thumbnail.thumbnail(size)
+            thumbnail.save(target, "JPEG", quality=85, optimize=True)
+
+async def save_cover(upload: UploadFile) -> str:
+    """Stream an uploaded cover to disk and return its public URL
+
+    The file is written off the event loop, checked to be an image, named
+    after its SHA-256 hash so identical uploads are stored once, and
+    thumbnailed in a process pool.
+    """
+    extension = os.path.splitext(upload.filename or "")[1].lower()
+    if extension not in ALLOWED_EXTENSIONS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Cover image must be one of: {', '.join(sorted(ALLOWED_EXTENSIONS))}"
+        )
+    
+    directory = settings.COVER_UPLOAD_DIR
+    os.makedirs(directory, exist_ok=True)
+    
+    digest = hashlib.sha256()
+    size = 0
+    handle = await run_in_threadpool(tempfile.NamedTemporaryFile, dir=directory, delete=False)
+    try:
+        while chunk := await upload.read(CHUNK_SIZE):
+            size += len(chunk)
+            if size > settings.COVER_MAX_BYTES:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail="Cover image is too large"
+                )
+            digest.update(chunk)
+            await run_in_threadpool(handle.write, chunk)
+        await run_in_threadpool(handle.close)
+    except BaseException:
+        await run_in_threadpool(handle.close)
+        await run_in_threadpool(os.remove, handle.name)
+        raise
+    
+    if not await run_in_threadpool(_is_image, handle.name):
+        await run_in_threadpool(os.remove, handle.name)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cover image is not a valid image file"
+        )
+    
+    digest = digest.hexdigest()
+    name = f"{digest}{extension}"
+    path = os.path.join(directory, name)
+    
+    if os.path.exists(path):
+        # Same image already stored
+        await run_in_threadpool(os.remove, handle.name)
+    else:
+        await run_in_threadpool(os.replace, handle.name, path)
+    
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(_get_thumbnail_pool(), _make_thumbnails, path, digest, directory)
+    
+    return cover_url(name)
+
+def cover_path(name: str, size: str = "original") -> str:
+    """Resolve a stored cover (or its thumbnail) to a file on disk"""
+    if not COVER_NAME.match(name):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Cover not found"
+        )
+    
+    directory = settings.COVER_UPLOAD_DIR
+    if size in THUMBNAIL_SIZES:
+        digest = os.path.splitext(name)[0]
+        thumbnail = os.path.join(directory, f"{digest}_{size}.jpg")
+        if os.path.exists(thumbnail):
+            return thumbnail
+    
+    path = os.path.join(directory, name)
+    if not os.path.exists(path):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Cover not found"
+        )
+    return path
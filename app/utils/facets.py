@@ -0,0 +1,100 @@
+from app.cores.database import books_collection, book_facets_collection
+from pymongo import UpdateOne
+
+# Book fields that are maintained as facets in `book_facets`
+FACET_TYPES = ["category", "author"]
+
+def facet_changes(book: dict, sign: int = 1) -> list:
+    """Facet counter deltas contributed by a single book document
+
+    Each change is a `(facet_type, value, book_delta, available_delta)` tuple.
+    Use `sign=-1` for a removed (or pre-update) document.
+    """
+    available = book.get("available_copies", 0) or 0
+    changes = []
+    for facet_type in FACET_TYPES:
+        value = book.get(facet_type)
+        if value:
+            changes.append((facet_type, value, sign, sign * available))
+    return changes
+
+def availability_changes(book: dict, delta: int) -> list:
+    """Facet deltas for a change in available copies only (borrow/return)"""
+    return [
+        (facet_type, book[facet_type], 0, delta)
+        for facet_type in FACET_TYPES
+        if book.get(facet_type)
+    ]
+
+async def apply_facet_changes(changes: list):
+    """Merge facet deltas and apply them with a single bulk write"""
+    merged = {}
+    for facet_type, value, book_delta, available_delta in changes:
+        key = (facet_type, value)
+        books, available = merged.get(key, (0, 0))
+        merged[key] = (books + book_delta, available + available_delta)
+    
+    operations = [
+        UpdateOne(
+            {"type": facet_type, "value": value},
+            {
+                "$inc": {"book_count": books, "available_copies": available},
+                "$setOnInsert": {"value_lower": value.lower()}
+            },
+            upsert=True
+        )
+        for (facet_type, value), (books, available) in merged.items()
+        if books or available
+    ]
+    if not operations:
+        return
+    
+    await book_facets_collection.bulk_write(operations, ordered=False)
+    
+    if any(books < 0 for books, _ in merged.values()):
+        await book_facets_collection.delete_many({"book_count": {"$lte": 0}})
+
+async def rebuild_facets():
+    """Recompute every facet from the books collection"""
+    facets = []
+    for facet_type in FACET_TYPES:
+        pipeline = [
+            {"$match": {facet_type: {"$nin": [None, ""]}}},
+            {"$group": {
+                "_id": f"${facet_type}",
+                "book_count": {"$sum": 1},
+                "available_copies": {"$sum": {"$ifNull": ["$available_copies", 0]}}
+            }}
+        ]
+        async for result in books_collection.aggregate(pipeline, allowDiskUse=True):
+            facets.append({
+                "type": facet_type,
+                "value": result["_id"],
+                "value_lower": str(result["_id"]).lower(),
+                "book_count": result["book_count"],
+                "available_copies": result["available_copies"]
+            })
+    
+    await book_facets_collection.delete_many({})
+    if facets:
+        await book_facets_collection.insert_many(facets, ordered=False)
+    
+    return len(facets)
+
+async def list_facets(facet_type: str, prefix: str = None, page: int = 1, page_size: int = 100):
+    """Page through one facet type, optionally filtered by a case-insensitive prefix"""
+    query = {"type": facet_type, "book_count": {"$gt": 0}}
+    if prefix:
+        prefix = prefix.lower()
+        query["value_lower"] = {"$gte": prefix, "$lt": prefix + "\uffff"}
+    
+    skip = (page - 1) * page_size
+    facets = []
+    cursor = book_facets_collection.find(
+        query,
+        {"_id": 0, "value": 1, "book_count": 1, "available_copies": 1}
+    ).sort("value_lower", 1).skip(skip).limit(page_size + 1)
+    async for facet in cursor:
+        facets.append(facet)
+    
+    return facets[:page_size], len(facets) > page_size
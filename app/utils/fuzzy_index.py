@@ -0,0 +1,180 @@
+from app.cores.database import books_collection, users_collection
+from app.cores.config import settings
+from app.utils.live_index import LiveIndex
+from array import array
+import numpy as np
+import math
+import re
+
+WORD = re.compile(r"[a-z0-9]+")
+
+def trigrams(text) -> set:
+    """Distinct trigrams of each word, padded like PostgreSQL's pg_trgm"""
+    grams = set()
+    for word in WORD.findall(str(text or "").lower()):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+class TrigramIndex:
+    """In-memory trigram postings over distinct values for fuzzy lookup
+    
+    Each distinct value gets a stable integer ID; postings are compact
+    `array('i')` lists of value IDs per trigram, read as NumPy arrays at
+    query time so shared-trigram counts come from one `bincount` instead
+    of a scan. Values carry a reference count (how many rows hold them)
+    and drop out of results when it reaches zero.
+    """
+
+    def __init__(self):
+        self.value_ids = {}
+        self.values = []
+        self.sizes = array("i")
+        self.refs = array("i")
+        self.postings = {}
+        self.ready = False
+
+    def __len__(self):
+        return sum(1 for refs in self.refs if refs > 0)
+
+    def add(self, value, count: int = 1):
+        """Count `count` more rows holding a value (negative to uncount)"""
+        if not value or not count:
+            return
+        value = str(value)
+        
+        value_id = self.value_ids.get(value)
+        if value_id is None:
+            if count < 0:
+                return
+            grams = trigrams(value)
+            if not grams:
+                return
+            value_id = len(self.values)
+            self.value_ids[value] = value_id
+            self.values.append(value)
+            self.sizes.append(len(grams))
+            self.refs.append(0)
+            for gram in grams:
+                postings = self.postings.get(gram)
+                if postings is None:
+                    postings = self.postings[gram] = array("i")
+                postings.append(value_id)
+        
+        self.refs[value_id] = max(self.refs[value_id] + count, 0)
+
+    def remove(self, value):
+        """Uncount one row holding a value"""
+        self.add(value, -1)
+
+    def search(self, query: str, threshold: float = None, limit: int = None) -> list:
+        """Values similar to `query` as `(value, similarity)`, best first
+        
+        Similarity is trigram Jaccard: shared / (query + value - shared).
+        """
+        if threshold is None:
+            threshold = settings.FUZZY_THRESHOLD
+        if limit is None:
+            limit = settings.FUZZY_MAX_MATCHES
+        
+        grams = trigrams(query)
+        postings = [self.postings[gram] for gram in grams if gram in self.postings]
+        if not postings:
+            return []
+        
+        value_ids = np.concatenate([np.frombuffer(p, dtype=np.int32) for p in postings])
+        shared = np.bincount(value_ids, minlength=len(self.values))
+        
+        # A value reaching the threshold shares at least this many trigrams
+        min_shared = max(1, math.ceil(threshold * len(grams) / (1 + threshold)))
+        candidates = np.nonzero(shared >= min_shared)[0]
+        candidates = candidates[np.frombuffer(self.refs, dtype=np.int32)[candidates] > 0]
+        if not len(candidates):
+            return []
+        
+        common = shared[candidates]
+        sizes = np.frombuffer(self.sizes, dtype=np.int32)[candidates]
+        similarity = common / (len(grams) + sizes - common)
+        matched = similarity >= threshold
+        candidates, similarity = candidates[matched], similarity[matched]
+        
+        order = np.argsort(-similarity, kind="stable")[:limit]
+        return [(self.values[candidates[i]], round(float(similarity[i]), 4)) for i in order]
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "values": len(self),
+            "trigrams": len(self.postings)
+        }
+
+# Fuzzy lookup targets: book titles, book authors and user (member) names
+fuzzy_indexes = {
+    "titles": TrigramIndex(),
+    "authors": TrigramIndex(),
+    "members": TrigramIndex()
+}
+
+# Document field counted by each fuzzy index (books hold the first two, users the last)
+FUZZY_FIELDS = {
+    "titles": "title",
+    "authors": "author",
+    "members": "full_name"
+}
+
+def _move(indexes: dict, key: str, before: dict, after: dict):
+    for name, field in FUZZY_FIELDS.items():
+        old = (before or {}).get(field)
+        new = (after or {}).get(field)
+        if old != new:
+            indexes[name].add(old, -1)
+            indexes[name].add(new, 1)
+
+async def _load_indexes(fresh: dict, live: LiveIndex):
+    cursor = books_collection.find({}, {"title": 1, "author": 1}).batch_size(settings.EXPORT_BATCH_SIZE)
+    async for book in cursor:
+        if live.should_count(str(book["_id"])):
+            _move(fresh, None, None, book)
+    
+    async for user in users_collection.find({}, {"full_name": 1}):
+        if live.should_count(str(user["_id"])):
+            _move(fresh, None, None, user)
+
+_live = LiveIndex(
+    fuzzy_indexes,
+    lambda: {name: TrigramIndex() for name in fuzzy_indexes},
+    _load_indexes,
+    _move
+)
+
+async def ensure_fuzzy_indexes():
+    """Build the fuzzy indexes from the database on first use"""
+    return await _live.ensure()
+
+async def rebuild_fuzzy_indexes():
+    """Rebuild the fuzzy indexes from scratch"""
+    await _live.rebuild()
+    return {name: index.stats() for name, index in fuzzy_indexes.items()}
+
+async def fuzzy_search(name: str, query: str, threshold: float = None, limit: int = None) -> list:
+    """Similarity-ranked `(value, similarity)` matches from one fuzzy index"""
+    indexes = await ensure_fuzzy_indexes()
+    return indexes[name].search(query, threshold, limit)
+
+async def fuzzy_book_clauses(search: str) -> list:
+    """`$or` clauses matching books whose title or author is similar to `search`"""
+    titles = [value for value, _ in await fuzzy_search("titles", search)]
+    authors = [value for value, _ in await fuzzy_search("authors", search)]
+    return [{"title": {"$in": titles}}, {"author": {"$in": authors}}]
+
+def fuzzy_book_written(book: dict, old_book: dict = None):
+    """Move a book's title and author from their old values to the new ones"""
+    _live.write(str(book["_id"]), old_book, book)
+
+def fuzzy_book_deleted(book: dict):
+    """Uncount a deleted book's title and author"""
+    _live.write(str(book["_id"]), book, None)
+
+def fuzzy_user_added(user: dict):
+    """Count a newly registered user's name"""
+    _live.write(str(user["_id"]), None, user)
@@ -0,0 +1,77 @@
+import asyncio
+
+class LiveIndex:
+    """An in-memory index kept current by writes and rebuilt from the database
+    
+    `load(fresh, live)` scans the database into a new, empty index and asks
+    `live.should_count(key)` before counting each document. `move(index,
+    key, before, after)` changes a document's contribution from state
+    `before` to `after` (either may be None for "absent").
+    
+    Writes go straight to the serving index. While a rebuild runs they are
+    also logged per document, with whether the scan had already counted it
+    and its first `before` state. The scan skips documents written before it
+    reaches them. Once it finishes, each logged document is moved on the
+    fresh index from what the scan counted to its latest state, and the fresh
+    index is swapped in. A document is therefore counted once, whichever side
+    of the scan its writes landed on.
+    """
+
+    def __init__(self, index, new_index, load, move):
+        self.index = index
+        self._new_index = new_index
+        self._load = load
+        self._move = move
+        self._lock = asyncio.Lock()
+        self._log = None
+        self._scanned = None
+
+    def _parts(self, index) -> list:
+        # Several indexes filled by one scan are kept in a dict by name
+        return list(index.values()) if isinstance(index, dict) else [index]
+
+    @property
+    def ready(self) -> bool:
+        return all(part.ready for part in self._parts(self.index))
+
+    def write(self, key: str, before=None, after=None):
+        """Move one document from state `before` to `after` (None when absent)"""
+        self._move(self.index, key, before, after)
+        if self._log is not None:
+            counted, first_before, _ = self._log.get(key, (key in self._scanned, before, None))
+            self._log[key] = (counted, first_before, after)
+
+    def should_count(self, key: str) -> bool:
+        """Whether the running scan should count a document it has just read"""
+        if key in self._log:
+            return False
+        self._scanned.add(key)
+        return True
+
+    async def _build(self):
+        fresh = self._new_index()
+        self._log, self._scanned = {}, set()
+        try:
+            await self._load(fresh, self)
+            for key, (counted, before, after) in self._log.items():
+                self._move(fresh, key, before if counted else None, after)
+        finally:
+            self._log = self._scanned = None
+        
+        for live, part in zip(self._parts(self.index), self._parts(fresh)):
+            live.__dict__.update(part.__dict__)
+            live.ready = True
+
+    async def ensure(self):
+        """Build the index on first use"""
+        if not self.ready:
+            async with self._lock:
+                if not self.ready:
+                    await self._build()
+        return self.index
+
+    async def rebuild(self):
+        """Rebuild the index from scratch"""
+        async with self._lock:
+            await self._build()
+        return self.index
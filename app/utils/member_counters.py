@@ -0,0 +1,120 @@
+from app.cores.database import members_collection, transactions_collection, fines_collection
+from app.cores.config import settings
+from pymongo import UpdateOne
+from bson import ObjectId
+
+# Circulation counters kept on each member document, with their empty values
+COUNTER_FIELDS = {
+    "current_borrowed": 0,
+    "pending_fine_total": 0.0
+}
+
+def has_counters(member: dict) -> bool:
+    """Whether a member document carries the denormalized counters"""
+    return all(field in member for field in COUNTER_FIELDS)
+
+def _counter_filter(member_id: str) -> dict:
+    # Members without counters are skipped rather than started from zero;
+    # eligibility counts from source for them until they are reconciled
+    return {"_id": ObjectId(member_id), "current_borrowed": {"$exists": True}}
+
+def _counter_inc(borrowed: int, fines: float) -> dict:
+    return {"$inc": {"current_borrowed": borrowed, "pending_fine_total": fines}}
+
+async def adjust_member_counters(member_id: str, borrowed: int = 0, fines: float = 0.0, session=None):
+    """Apply a change in open loans and pending fines to one member"""
+    if not ObjectId.is_valid(member_id):
+        return
+    await members_collection.update_one(
+        _counter_filter(member_id),
+        _counter_inc(borrowed, fines),
+        session=session
+    )
+
+async def adjust_member_counters_bulk(deltas: dict):
+    """Apply `member_id -> (borrowed, fines)` changes with one bulk write"""
+    operations = [
+        UpdateOne(_counter_filter(member_id), _counter_inc(borrowed, fines))
+        for member_id, (borrowed, fines) in deltas.items()
+        if (borrowed or fines) and ObjectId.is_valid(member_id)
+    ]
+    if operations:
+        await members_collection.bulk_write(operations, ordered=False)
+
+async def _source_counters() -> tuple:
+    borrowed = {}
+    pipeline = [
+        {"$match": {"status": "borrowed"}},
+        {"$group": {"_id": "$member_id", "count": {"$sum": 1}}}
+    ]
+    async for result in transactions_collection.aggregate(pipeline, allowDiskUse=True):
+        borrowed[str(result["_id"])] = result["count"]
+    
+    fines = {}
+    pipeline = [
+        {"$match": {"status": "pending"}},
+        {"$group": {"_id": "$member_id", "total": {"$sum": "$amount"}}}
+    ]
+    async for result in fines_collection.aggregate(pipeline, allowDiskUse=True):
+        fines[str(result["_id"])] = round(float(result["total"]), 2)
+    
+    return borrowed, fines
+
+async def reconcile_member_counters(fix: bool = True, sample_size: int = 50) -> dict:
+    """Recompute every member's counters from transactions and fines
+    
+    Members whose stored counters are missing or differ are reported (up to
+    `sample_size` of them) and, with `fix`, overwritten. Writes are guarded
+    on the counter values that were read, but the expected values come from
+    a snapshot taken at the start, so run it while circulation is quiet;
+    a member whose loans changed mid-run is settled by the next run.
+    """
+    borrowed, fines = await _source_counters()
+    
+    scanned = 0
+    missing = 0
+    drifted = 0
+    sample = []
+    operations = []
+    fixed = 0
+    projection = {field: 1 for field in COUNTER_FIELDS}
+    
+    async def flush():
+        nonlocal operations, fixed
+        if operations:
+            result = await members_collection.bulk_write(operations, ordered=False)
+            fixed += result.modified_count
+            operations = []
+    
+    async for member in members_collection.find({}, projection).batch_size(settings.EXPORT_BATCH_SIZE):
+        scanned += 1
+        member_id = str(member["_id"])
+        expected = {
+            "current_borrowed": borrowed.get(member_id, 0),
+            "pending_fine_total": fines.get(member_id, 0.0)
+        }
+        stored = {field: member.get(field) for field in COUNTER_FIELDS}
+        if not has_counters(member):
+            missing += 1
+        elif stored["current_borrowed"] == expected["current_borrowed"] and \
+                round(stored["pending_fine_total"], 2) == expected["pending_fine_total"]:
+            continue
+        else:
+            drifted += 1
+            if len(sample) < sample_size:
+                sample.append({"member_id": member_id, "stored": stored, "expected": expected})
+        
+        if fix:
+            guard = {field: member[field] if field in member else {"$exists": False} for field in COUNTER_FIELDS}
+            operations.append(UpdateOne({"_id": member["_id"], **guard}, {"$set": expected}))
+            if len(operations) >= settings.BULK_BATCH_SIZE:
+                await flush()
+    await flush()
+    
+    return {
+        "members_scanned": scanned,
+        "missing_counters": missing,
+        "drifted": drifted,
+        "drift_sample": sample,
+        "fixed": fixed if fix else 0
+    }
@@ -0,0 +1,117 @@
+from app.cores.config import settings
+from app.utils.query_compiler import time_limit
+from fastapi import HTTPException, status
+from bson import ObjectId
+from datetime import datetime
+import base64
+import json
+import time
+
+def encode_cursor(last_id) -> str:
+    """Encode the last seen document ID as an opaque cursor"""
+    payload = json.dumps({"id": str(last_id)}).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> ObjectId:
+    """Decode an opaque cursor back into the last seen document ID"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return ObjectId(payload["id"])
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+def seek_query(query: dict, cursor: str) -> dict:
+    """Combine a filter query with an `_id` seek for keyset pagination"""
+    if not cursor:
+        return query
+
+    seek = {"_id": {"$gt": decode_cursor(cursor)}}
+    if not query:
+        return seek
+    return {"$and": [query, seek]}
+
+def encode_sort_cursor(value: datetime, last_id) -> str:
+    """Encode the sort key (a datetime) and ID of the last seen document"""
+    payload = json.dumps({"after": value.isoformat(), "id": str(last_id)}).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+def seek_sorted_query(query: dict, field: str, cursor: str) -> dict:
+    """Combine a filter with a seek past `(field, _id)` for keyset pagination sorted on `field`"""
+    if not cursor:
+        return query
+    
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        after, last_id = datetime.fromisoformat(payload["after"]), ObjectId(payload["id"])
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+    
+    seek = {"$or": [
+        {field: {"$gt": after}},
+        {field: after, "_id": {"$gt": last_id}}
+    ]}
+    if not query:
+        return seek
+    return {"$and": [query, seek]}
+
+# Short-lived cache of filtered counts, keyed by collection and normalized filter
+_count_cache = {}
+
+def _count_cache_key(collection, query: dict) -> str:
+    """Normalize a filter so equivalent queries share a cache entry"""
+    return f"{collection.name}:{json.dumps(query, sort_keys=True, default=str)}"
+
+async def count_total(collection, query: dict, count_strategy: str = "exact", include_total: bool = True):
+    """Count matching documents using the requested strategy
+
+    Returns a `(total, strategy_used)` tuple. `exact` always runs
+    `count_documents`; `estimated` uses collection metadata for unfiltered
+    queries and otherwise falls back to `cached`, which reuses a recent count
+    for the same filter. With `include_total=False` nothing is counted.
+    """
+    if not include_total:
+        return None, "none"
+    
+    if count_strategy == "exact":
+        return await collection.count_documents(query, **time_limit()), "exact"
+    
+    if count_strategy == "estimated" and not query:
+        return await collection.estimated_document_count(), "estimated"
+    
+    key = _count_cache_key(collection, query)
+    now = time.monotonic()
+    cached = _count_cache.get(key)
+    if cached and cached[1] > now:
+        return cached[0], "cached"
+    
+    total = await collection.count_documents(query, **time_limit())
+    if len(_count_cache) >= settings.COUNT_CACHE_MAX_ENTRIES:
+        # Drop the oldest entry (dicts keep insertion order)
+        _count_cache.pop(next(iter(_count_cache)))
+    _count_cache.pop(key, None)
+    _count_cache[key] = (total, now + settings.COUNT_CACHE_TTL_SECONDS)
+    return total, "cached"
+
+def trim_page(items: list, page_size: int, skip: int, total):
+    """Trim an over-fetched page and work out whether more results follow
+
+    When no total was counted the caller fetches `page_size + 1` rows, and the
+    extra row only signals that another page exists.
+    """
+    if total is None:
+        return items[:page_size], len(items) > page_size
+    return items, skip + len(items) < total
+
+def total_pages(total, page_size: int):
+    """Number of pages for a known total, or None when it was not counted"""
+    if total is None:
+        return None
+    return (total + page_size - 1) // page_size
@@ -0,0 +1,104 @@
+from app.cores.database import transactions_collection, book_popularity_collection, book_popularity_daily_collection
+from app.cores.config import settings
+from datetime import datetime, timedelta
+import asyncio
+import time
+
+# Ranking windows and how many daily buckets each covers (None for all time)
+POPULARITY_WINDOWS = {
+    "all": None,
+    "7d": 7,
+    "30d": 30
+}
+
+def _day(moment: datetime) -> datetime:
+    return datetime(moment.year, moment.month, moment.day)
+
+async def record_borrow_popularity(book_id: str, borrowed_at: datetime = None):
+    """Count a borrow in the all-time counter and today's bucket"""
+    day = _day(borrowed_at or datetime.utcnow())
+    await asyncio.gather(
+        book_popularity_collection.update_one(
+            {"_id": str(book_id)},
+            {"$inc": {"borrow_count": 1}},
+            upsert=True
+        ),
+        book_popularity_daily_collection.update_one(
+            {"day": day, "book_id": str(book_id)},
+            {"$inc": {"borrow_count": 1}},
+            upsert=True
+        )
+    )
+
+# Cached rankings: window -> (expires_at, [(book_id, borrow_count), ...])
+_rankings = {}
+
+async def _compute_ranking(window: str) -> list:
+    days = POPULARITY_WINDOWS[window]
+    size = settings.POPULARITY_RANKING_SIZE
+    
+    if days is None:
+        cursor = book_popularity_collection.find().sort("borrow_count", -1).limit(size)
+        return [(doc["_id"], doc["borrow_count"]) async for doc in cursor]
+    
+    since = _day(datetime.utcnow()) - timedelta(days=days - 1)
+    pipeline = [
+        {"$match": {"day": {"$gte": since}}},
+        {"$group": {"_id": "$book_id", "borrow_count": {"$sum": "$borrow_count"}}},
+        {"$sort": {"borrow_count": -1, "_id": 1}},
+        {"$limit": size}
+    ]
+    return [
+        (result["_id"], result["borrow_count"])
+        async for result in book_popularity_daily_collection.aggregate(pipeline)
+    ]
+
+async def top_books(window: str = "all", limit: int = 10) -> list:
+    """Most borrowed `(book_id, borrow_count)` pairs in a window
+    
+    Rankings are recomputed from the counters at most every
+    POPULARITY_CACHE_TTL_SECONDS, so serving one costs O(limit).
+    """
+    cached = _rankings.get(window)
+    if cached is None or cached[0] <= time.monotonic():
+        ranking = await _compute_ranking(window)
+        _rankings[window] = (time.monotonic() + settings.POPULARITY_CACHE_TTL_SECONDS, ranking)
+        cached = _rankings[window]
+    return cached[1][:limit]
+
+async def rebuild_popularity():
+    """Recompute the popularity counters from the transactions collection"""
+    counters = []
+    pipeline = [{"$group": {"_id": "$book_id", "borrow_count": {"$sum": 1}}}]
+    async for result in transactions_collection.aggregate(pipeline, allowDiskUse=True):
+        if result["_id"]:
+            counters.append({"_id": str(result["_id"]), "borrow_count": result["borrow_count"]})
+    
+    since = _day(datetime.utcnow()) - timedelta(days=max(days for days in POPULARITY_WINDOWS.values() if days) - 1)
+    buckets = []
+    pipeline = [
+        {"$match": {"borrow_date": {"$gte": since}}},
+        {"$group": {
+            "_id": {
+                "book_id": "$book_id",
+                "day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$borrow_date"}}
+            },
+            "borrow_count": {"$sum": 1}
+        }}
+    ]
+    async for result in transactions_collection.aggregate(pipeline, allowDiskUse=True):
+        buckets.append({
+            "day": datetime.strptime(result["_id"]["day"], "%Y-%m-%d"),
+            "book_id": str(result["_id"]["book_id"]),
+            "borrow_count": result["borrow_count"]
+        })
+    
+    await book_popularity_collection.delete_many({})
+    if counters:
+        await book_popularity_collection.insert_many(counters, ordered=False)
+    await book_popularity_daily_collection.delete_many({})
+    if buckets:
+        await book_popularity_daily_collection.insert_many(buckets, ordered=False)
+    _rankings.clear()
+    
+    return {"books": len(counters), "daily_buckets": len(buckets)}
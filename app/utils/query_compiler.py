@@ -0,0 +1,72 @@
+from app.cores.config import settings
+import re
+
+# Lowercase copies of searchable fields live under this subdocument
+SEARCH_KEYS = "search_keys"
+
+# Fields mirrored into `search_keys` for anchored prefix lookups
+BOOK_SEARCH_FIELDS = ["title", "author", "category"]
+USER_SEARCH_FIELDS = ["full_name", "email"]
+
+# Projection that keeps the shadow fields out of responses
+HIDDEN_FIELDS = {SEARCH_KEYS: 0}
+
+def normalize(value) -> str:
+    """Normalized form stored in `search_keys` (matching init_db.py's `$toLower` backfill)"""
+    return str(value).lower()
+
+def search_keys(doc: dict, fields: list) -> dict:
+    """`search_keys` subdocument for a document about to be written"""
+    return {field: normalize(doc[field]) for field in fields if doc.get(field)}
+
+def search_key_updates(update_data: dict, fields: list) -> dict:
+    """`$set` entries keeping `search_keys` in step with a partial update"""
+    return {
+        f"{SEARCH_KEYS}.{field}": normalize(update_data[field])
+        for field in fields if update_data.get(field)
+    }
+
+def _term(value) -> str:
+    return str(value).strip()[:settings.MAX_SEARCH_TERM_LENGTH]
+
+def contains(field: str, value) -> dict:
+    """Case-insensitive substring match with user input escaped"""
+    return {field: {"$regex": re.escape(_term(value)), "$options": "i"}}
+
+def prefix(field: str, value, stored_as=None) -> dict:
+    """Index-friendly prefix match as a range over the field's `search_keys` copy
+
+    Fields already stored in a searchable form (e.g. upper-case membership
+    IDs) are matched directly by passing that form as `stored_as`.
+    """
+    if stored_as is None:
+        field, key = f"{SEARCH_KEYS}.{field}", normalize(_term(value))
+    else:
+        key = stored_as(_term(value))
+    return {field: {"$gte": key, "$lt": key + "\uffff"}}
+
+def match_field(field: str, value, search_mode: str = "regex") -> dict:
+    """Filter for one field: prefix range in `prefix` mode, escaped substring otherwise"""
+    if search_mode == "prefix":
+        return prefix(field, value)
+    return contains(field, value)
+
+def match_any(fields: list, value, search_mode: str = "regex") -> list:
+    """`$or` clauses matching `value` against any of `fields`
+
+    Prefix mode only applies to fields mirrored in `search_keys`; the rest
+    fall back to an escaped substring match.
+    """
+    mirrored = BOOK_SEARCH_FIELDS + USER_SEARCH_FIELDS
+    return [
+        match_field(field, value, search_mode if field in mirrored else "regex")
+        for field in fields
+    ]
+
+def time_limited(cursor):
+    """Bound a find cursor by `QUERY_MAX_TIME_MS`"""
+    return cursor.max_time_ms(settings.QUERY_MAX_TIME_MS)
+
+def time_limit() -> dict:
+    """`maxTimeMS` keyword for count and aggregate calls"""
+    return {"maxTimeMS": settings.QUERY_MAX_TIME_MS}
@@ -0,0 +1,102 @@
+from app.cores.config import settings
+from collections import OrderedDict
+import asyncio
+import time
+
+class RecommendationCache:
+    """Size-bounded LRU cache of computed recommendation lists per member
+    
+    `compute` is the coroutine function that builds a member's list. When a
+    member borrows or returns a book their entry is dropped and recomputed
+    in the background, so the next dashboard load is normally a hit. The
+    TTL bounds how long lists lag behind other members' borrowing.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.compute = None
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._tasks = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.refreshes = 0
+
+    def get(self, member_id: str):
+        entry = self._entries.get(member_id)
+        if entry is None or entry[1] <= time.monotonic():
+            self.misses += 1
+            return None
+        
+        self._entries.move_to_end(member_id)
+        self.hits += 1
+        return entry[0]
+
+    def set(self, member_id: str, recommendations: dict):
+        self._entries[member_id] = (recommendations, time.monotonic() + self.ttl_seconds)
+        self._entries.move_to_end(member_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get_or_compute(self, member_id: str) -> dict:
+        """Cached list for a member, computing (and caching) it on a miss"""
+        recommendations = self.get(member_id)
+        if recommendations is None:
+            generation = self._generations.get(member_id, 0)
+            recommendations = await self.compute(member_id)
+            # Do not cache a list computed before a borrow or return landed
+            if self._generations.get(member_id, 0) == generation:
+                self.set(member_id, recommendations)
+        return recommendations
+
+    def refresh(self, member_id: str):
+        """Drop a member's list and recompute it in the background"""
+        member_id = str(member_id)
+        self._entries.pop(member_id, None)
+        self._generations[member_id] = self._generations.get(member_id, 0) + 1
+        
+        if self.compute is not None and member_id not in self._tasks:
+            task = asyncio.create_task(self._refresh(member_id))
+            self._tasks[member_id] = task
+            task.add_done_callback(lambda _: self._tasks.pop(member_id, None))
+
+    async def _refresh(self, member_id: str):
+        # Recompute until no further change arrived during the computation
+        while True:
+            generation = self._generations.get(member_id, 0)
+            try:
+                recommendations = await self.compute(member_id)
+            except Exception:
+                return
+            if self._generations.get(member_id, 0) == generation:
+                self.set(member_id, recommendations)
+                self.refreshes += 1
+                return
+
+    async def prewarm(self, member_ids):
+        """Compute and cache lists for the given members, one at a time"""
+        for member_id in member_ids:
+            if member_id not in self._entries:
+                await self.get_or_compute(member_id)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "background_refreshes": self.refreshes,
+            "refreshing": len(self._tasks)
+        }
+
+recommendation_cache = RecommendationCache(
+    settings.RECOMMENDATION_CACHE_MAX_SIZE,
+    settings.RECOMMENDATION_CACHE_TTL_SECONDS
+)
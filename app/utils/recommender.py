@@ -0,0 +1,120 @@
+from app.cores.database import transactions_collection
+from app.cores.config import settings
+from app.utils.live_index import LiveIndex
+from collections import defaultdict
+import heapq
+import math
+
+class CoBorrowModel:
+    """Item-to-item recommendations from books borrowed by the same members
+    
+    `co_counts` is a sparse symmetric matrix (dict of dicts) of how many
+    members borrowed both books; `book_counts` is how many members borrowed
+    each book. Similarity is the cosine of the two books' borrower sets.
+    Each book's top neighbours are computed on first use and dropped when
+    a borrow touches that book, so lookups cost O(k) per history item.
+    """
+
+    def __init__(self):
+        self.co_counts = defaultdict(lambda: defaultdict(int))
+        self.book_counts = defaultdict(int)
+        self.histories = defaultdict(list)
+        self._history_sets = defaultdict(set)
+        self._neighbors = {}
+        self.ready = False
+
+    def add_borrow(self, member_id: str, book_id: str):
+        """Count a borrow; repeat borrows of the same book change nothing"""
+        member_id, book_id = str(member_id), str(book_id)
+        if book_id in self._history_sets[member_id]:
+            return
+        
+        history = self.histories[member_id]
+        # Only the most recent part of very long histories forms pairs
+        for other in history[-settings.RECOMMENDATION_HISTORY_LIMIT:]:
+            self.co_counts[book_id][other] += 1
+            self.co_counts[other][book_id] += 1
+            self._neighbors.pop(other, None)
+        
+        self.book_counts[book_id] += 1
+        self._neighbors.pop(book_id, None)
+        history.append(book_id)
+        self._history_sets[member_id].add(book_id)
+
+    def history(self, member_id: str) -> list:
+        """Distinct books a member has borrowed, oldest first"""
+        return self.histories.get(str(member_id), [])
+
+    def neighbors(self, book_id: str) -> list:
+        """Top `(book_id, similarity)` neighbours of a book"""
+        cached = self._neighbors.get(book_id)
+        if cached is not None:
+            return cached
+        
+        co_counts = self.co_counts.get(book_id)
+        if not co_counts:
+            return []
+        
+        count = self.book_counts[book_id]
+        book_counts = self.book_counts
+        neighbors = heapq.nlargest(
+            settings.RECOMMENDATION_NEIGHBORS,
+            ((other, shared / math.sqrt(count * book_counts[other])) for other, shared in co_counts.items()),
+            key=lambda pair: pair[1]
+        )
+        self._neighbors[book_id] = neighbors
+        return neighbors
+
+    def recommend(self, member_id: str, limit: int = 10) -> list:
+        """Ranked `(book_id, score)` suggestions the member has not borrowed yet
+        
+        A candidate's score is the sum of its similarity to each book in the
+        member's recent history.
+        """
+        member_id = str(member_id)
+        seen = self._history_sets.get(member_id, set())
+        scores = defaultdict(float)
+        for book_id in self.history(member_id)[-settings.RECOMMENDATION_HISTORY_LIMIT:]:
+            for other, similarity in self.neighbors(book_id):
+                if other not in seen:
+                    scores[other] += similarity
+        
+        return heapq.nlargest(limit, scores.items(), key=lambda pair: pair[1])
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "books": len(self.book_counts),
+            "members": len(self.histories),
+            "pairs": sum(len(row) for row in self.co_counts.values()) // 2,
+            "cached_neighbor_lists": len(self._neighbors)
+        }
+
+co_borrow_model = CoBorrowModel()
+
+async def _load_model(fresh: CoBorrowModel, live: LiveIndex):
+    projection = {"member_id": 1, "book_id": 1}
+    cursor = transactions_collection.find({}, projection).sort("_id", 1)
+    async for transaction in cursor.batch_size(settings.EXPORT_BATCH_SIZE):
+        if transaction.get("member_id") and transaction.get("book_id") and live.should_count(str(transaction["_id"])):
+            fresh.add_borrow(transaction["member_id"], transaction["book_id"])
+
+def _move_borrow(model: CoBorrowModel, transaction_id: str, before: dict, after: dict):
+    # Loans are only ever added; returns do not change who borrowed what
+    if before is None and after is not None:
+        model.add_borrow(after["member_id"], after["book_id"])
+
+_live = LiveIndex(co_borrow_model, CoBorrowModel, _load_model, _move_borrow)
+
+async def ensure_co_borrow_model():
+    """Build the co-borrow model from transaction history on first use"""
+    return await _live.ensure()
+
+async def rebuild_co_borrow_model():
+    """Rebuild the co-borrow model from scratch"""
+    await _live.rebuild()
+    return co_borrow_model.stats()
+
+def record_borrow(transaction_doc: dict):
+    """Feed a newly recorded loan into the co-borrow model"""
+    _live.write(str(transaction_doc["_id"]), None, transaction_doc)
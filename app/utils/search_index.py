@@ -0,0 +1,325 @@
+from app.cores.database import books_collection
+from app.cores.config import settings
+from app.utils.live_index import LiveIndex
+from starlette.concurrency import run_in_threadpool
+from collections import defaultdict, Counter
+from array import array
+import numpy as np
+import math
+import re
+
+TOKEN = re.compile(r"[a-z0-9]+")
+
+# Each field's tokens count this many times towards a book's term frequencies
+FIELD_WEIGHTS = {
+    "title": 3,
+    "author": 2,
+    "category": 2,
+    "publisher": 1,
+    "description": 1
+}
+
+def tokenize(text) -> list:
+    """Lowercase alphanumeric tokens of a piece of text"""
+    if not text:
+        return []
+    return TOKEN.findall(str(text).lower())
+
+# Term overflows are merged into the compact arrays once they reach this size
+# (or an eighth of the term's postings, whichever is larger)
+MERGE_MIN_PENDING = 1024
+
+# Common terms are only skipped once the catalog is large enough for it to matter
+STOPWORD_MIN_DOCS = 1000
+
+_NO_POSTINGS = (np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32))
+
+class BM25Index:
+    """In-memory inverted index over the catalog with BM25 ranking
+    
+    Books get sequential document numbers. Each term's postings are a pair of
+    NumPy arrays (document numbers and precomputed BM25 term impacts) sorted
+    by ascending impact, so the highest impacts form a suffix. Books written
+    after the arrays were built go into a small per-term overflow that is
+    merged in once it grows; removed books are tombstoned in `alive` and
+    dropped at the next merge. Impacts use the average document length at
+    the time they were computed, which a rebuild refreshes.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = {}
+        self.pending = defaultdict(dict)
+        self.df = Counter()
+        self.doc_ids = []
+        self.doc_numbers = {}
+        self.doc_terms = {}
+        self.lengths = array("I")
+        self.alive = np.zeros(1024, dtype=bool)
+        self.total_length = 0
+        self.average_length = 1.0
+        # (term ids, document numbers, frequencies) while bulk loading
+        self._staged = None
+        self._term_ids = {}
+        self._terms = []
+        self.ready = False
+
+    def __len__(self):
+        return len(self.doc_numbers)
+
+    def _impact(self, frequency: float, length: int, average_length: float) -> float:
+        norm = self.k1 * (1 - self.b + self.b * length / average_length)
+        return frequency * (self.k1 + 1) / (frequency + norm)
+
+    def add(self, book_id: str, book: dict):
+        """Index (or re-index) one book"""
+        self.remove(book_id)
+        
+        frequencies = Counter()
+        for field, weight in FIELD_WEIGHTS.items():
+            field_counts = Counter(tokenize(book.get(field)))
+            if weight != 1:
+                for token in field_counts:
+                    field_counts[token] *= weight
+            frequencies.update(field_counts)
+        
+        number = len(self.doc_ids)
+        length = sum(frequencies.values())
+        self.doc_ids.append(book_id)
+        self.doc_numbers[book_id] = number
+        self.doc_terms[book_id] = tuple(frequencies)
+        self.lengths.append(length)
+        self.total_length += length
+        if number >= len(self.alive):
+            alive = np.zeros(len(self.alive) * 2, dtype=bool)
+            alive[:len(self.alive)] = self.alive
+            self.alive = alive
+        self.alive[number] = True
+        self.df.update(frequencies.keys())
+        
+        if self._staged is not None:
+            term_ids, numbers, staged_frequencies = self._staged
+            for term, frequency in frequencies.items():
+                term_ids.append(self._term_id(term))
+                numbers.append(number)
+                staged_frequencies.append(frequency)
+            return
+        
+        for term, frequency in frequencies.items():
+            pending = self.pending[term]
+            pending[number] = self._impact(frequency, length, self.average_length)
+            if len(pending) > max(MERGE_MIN_PENDING, len(self.postings.get(term, _NO_POSTINGS)[0]) // 8):
+                self._merge(term)
+
+    def remove(self, book_id: str):
+        """Drop one book from the index (no-op if it is not indexed)"""
+        number = self.doc_numbers.pop(book_id, None)
+        if number is None:
+            return
+        self.alive[number] = False
+        self.total_length -= self.lengths[number]
+        
+        for term in self.doc_terms.pop(book_id, ()):
+            self.df[term] -= 1
+            if self.df[term] <= 0:
+                del self.df[term]
+                self.postings.pop(term, None)
+                self.pending.pop(term, None)
+            elif term in self.pending:
+                self.pending[term].pop(number, None)
+
+    def _merge(self, term: str):
+        """Fold a term's overflow into its arrays, dropping removed books"""
+        docs, impacts = self.postings.get(term, _NO_POSTINGS)
+        keep = self.alive[docs]
+        pending = self.pending.pop(term, {})
+        docs = np.concatenate([docs[keep], np.fromiter(pending.keys(), np.int32, len(pending))])
+        impacts = np.concatenate([impacts[keep], np.fromiter(pending.values(), np.float32, len(pending))])
+        order = np.argsort(impacts, kind="stable")
+        self.postings[term] = (docs[order], impacts[order])
+
+    def _term_id(self, term: str) -> int:
+        term_id = self._term_ids.get(term)
+        if term_id is None:
+            term_id = self._term_ids[term] = len(self._terms)
+            self._terms.append(term)
+        return term_id
+
+    def begin_bulk(self):
+        """Stage added books for a single `freeze` instead of per-term merges"""
+        self._staged = (array("i"), array("i"), array("f"))
+
+    def take_staged(self) -> tuple:
+        """Snapshot the staged postings for `freeze`; later adds are staged afresh"""
+        staged = self._staged
+        self.begin_bulk()
+        return staged, self.lengths[:], self.alive.copy(), list(self._terms), self.total_length, len(self.doc_numbers)
+
+    def freeze(self, snapshot: tuple) -> tuple:
+        """Build impact-sorted arrays for every staged term (CPU only, thread-safe)"""
+        (term_ids, numbers, frequencies), lengths, alive, terms, total_length, documents = snapshot
+        average_length = total_length / documents if documents else 1.0
+        term_ids = np.frombuffer(term_ids, dtype=np.int32)
+        numbers = np.frombuffer(numbers, dtype=np.int32)
+        frequencies = np.frombuffer(frequencies, dtype=np.float32)
+        
+        keep = alive[numbers]
+        term_ids, numbers, frequencies = term_ids[keep], numbers[keep], frequencies[keep]
+        lengths = np.frombuffer(lengths, dtype=np.uint32).astype(np.float32)
+        norms = self.k1 * (1 - self.b + self.b * lengths[numbers] / average_length)
+        impacts = (frequencies * (self.k1 + 1) / (frequencies + norms)).astype(np.float32)
+        
+        order = np.lexsort((impacts, term_ids))
+        term_ids, numbers, impacts = term_ids[order], numbers[order], impacts[order]
+        starts = np.flatnonzero(np.diff(term_ids)) + 1
+        postings = {}
+        for start, end in zip(np.concatenate([[0], starts]), np.concatenate([starts, [len(term_ids)]])):
+            if end > start:
+                postings[terms[term_ids[start]]] = (numbers[start:end], impacts[start:end])
+        return postings, average_length
+
+    def install(self, postings: dict, average_length: float):
+        """Swap in frozen arrays and move books staged since the snapshot into the overflow"""
+        self.postings = postings
+        self.average_length = average_length
+        term_ids, numbers, frequencies = self._staged
+        self._staged = None
+        for term_id, number, frequency in zip(term_ids, numbers, frequencies):
+            if self.alive[number]:
+                impact = self._impact(frequency, self.lengths[number], average_length)
+                self.pending[self._terms[term_id]][number] = impact
+        self._term_ids = {}
+        self._terms = []
+
+    def search(self, query: str, k: int = 20) -> list:
+        """Top-k `(book_id, score)` pairs for a free-text query
+        
+        In catalogs of STOPWORD_MIN_DOCS books or more, terms found in more
+        than BM25_STOPWORD_DF_RATIO of them are skipped when the query has
+        rarer terms. The rest are scored in order
+        of their maximum contribution, MaxScore style: once the k-th best
+        partial score exceeds what an unscored book could still reach, the
+        low-impact prefix of each later term only updates books that already
+        scored, so common terms cost a vectorized scan rather than a scatter
+        into every matching book.
+        """
+        terms = set(tokenize(query))
+        total_docs = len(self.doc_numbers)
+        if not terms or not total_docs:
+            return []
+        
+        alive = self.alive
+        capacity = len(alive)
+        lists = []
+        for term in terms:
+            df = self.df.get(term, 0)
+            if not df:
+                continue
+            docs, impacts = self.postings.get(term, _NO_POSTINGS)
+            pending = self.pending.get(term)
+            if pending:
+                pending = pending.copy()
+                extra_docs = np.fromiter(pending.keys(), np.int64, len(pending))
+                extra_impacts = np.fromiter(pending.values(), np.float32, len(pending))
+                inside = extra_docs < capacity
+                extra_docs, extra_impacts = extra_docs[inside], extra_impacts[inside]
+            else:
+                extra_docs, extra_impacts = _NO_POSTINGS
+            
+            max_impact = max(
+                float(impacts[-1]) if len(impacts) else 0.0,
+                float(extra_impacts.max()) if len(extra_impacts) else 0.0
+            )
+            idf = math.log(1 + (total_docs - df + 0.5) / (df + 0.5))
+            lists.append((idf * max_impact, idf, df, docs, impacts, extra_docs, extra_impacts))
+        
+        if total_docs >= STOPWORD_MIN_DOCS:
+            rare = [entry for entry in lists if entry[2] <= settings.BM25_STOPWORD_DF_RATIO * total_docs]
+            if rare:
+                lists = rare
+        if not lists:
+            return []
+        lists.sort(key=lambda entry: entry[0], reverse=True)
+        
+        # Most a book can still gain from the terms after each position
+        remaining = [0.0] * (len(lists) + 1)
+        for position in range(len(lists) - 1, -1, -1):
+            remaining[position] = remaining[position + 1] + lists[position][0]
+        
+        scores = np.zeros(capacity, dtype=np.float32)
+        threshold = 0.0
+        for position, (_, idf, _, docs, impacts, extra_docs, extra_impacts) in enumerate(lists):
+            # An unscored book needs at least this much from the current term to reach the top k
+            needed = (threshold - remaining[position + 1]) / idf
+            cutoff = int(np.searchsorted(impacts, needed, side="left")) if needed > 0 else 0
+            
+            head = docs[cutoff:]
+            scores[head] += idf * impacts[cutoff:]
+            if cutoff:
+                tail = docs[:cutoff]
+                scored = scores[tail] > 0
+                scores[tail[scored]] += idf * impacts[:cutoff][scored]
+            if len(extra_docs):
+                scores[extra_docs] += idf * extra_impacts
+            
+            if position + 1 < len(lists):
+                candidates = np.flatnonzero(scores)
+                candidates = candidates[alive[candidates]]
+                if len(candidates) >= k:
+                    threshold = float(np.partition(scores[candidates], len(candidates) - k)[len(candidates) - k])
+        
+        candidates = np.flatnonzero(scores)
+        candidates = candidates[alive[candidates]]
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(scores[candidates], len(candidates) - k)[len(candidates) - k:]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(self.doc_ids[number], float(scores[number])) for number in candidates]
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "documents": len(self.doc_numbers),
+            "terms": len(self.df),
+            "pending_postings": sum(len(pending) for pending in self.pending.values())
+        }
+
+search_index = BM25Index()
+
+async def _load_index(fresh: BM25Index, live: LiveIndex):
+    fresh.begin_bulk()
+    projection = {field: 1 for field in FIELD_WEIGHTS}
+    cursor = books_collection.find({}, projection).batch_size(settings.EXPORT_BATCH_SIZE)
+    async for book in cursor:
+        book_id = str(book["_id"])
+        if live.should_count(book_id):
+            fresh.add(book_id, book)
+    
+    # Sorting the postings is CPU-bound, so keep it off the event loop
+    postings, average_length = await run_in_threadpool(fresh.freeze, fresh.take_staged())
+    fresh.install(postings, average_length)
+
+def _move_book(index: BM25Index, book_id: str, before: dict, after: dict):
+    if after is None:
+        index.remove(book_id)
+    else:
+        index.add(book_id, after)
+
+_live = LiveIndex(search_index, BM25Index, _load_index, _move_book)
+
+async def ensure_search_index():
+    """Build the search index from the catalog on first use"""
+    return await _live.ensure()
+
+async def rebuild_search_index():
+    """Rebuild the search index from scratch (e.g. after an offline import)"""
+    await _live.rebuild()
+    return search_index.stats()
+
+def index_book(book: dict, old_book: dict = None):
+    """Add or refresh a written book in the search index"""
+    _live.write(str(book["_id"]), old_book, book)
+
+def unindex_book(book: dict):
+    """Remove a deleted book from the search index"""
+    _live.write(str(book["_id"]), book, None)
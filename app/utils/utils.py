@@ -2,8 +2,14 @@ from passlib.context import CryptContext
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
 from app.cores.config import settings
+from fastapi import HTTPException, status
+from typing import Optional
+from email.utils import format_datetime
+from datetime import timezone
+import hashlib
 import secrets
 import string
+import re
 
 # Password hashing context
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -51,3 +57,77 @@ def calculate_fine(due_date: datetime, return_date: datetime = None) -> float:
     
     overdue_days = (return_date - due_date).days
     return overdue_days * settings.FINE_PER_DAY
+
+_FIELD_NAME = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+def build_projection(fields: Optional[str], default_fields: Optional[list] = None) -> Optional[dict]:
+    """Turn a comma-separated `fields` parameter into a Mongo projection
+
+    `None` falls back to `default_fields`; `all` (or no default) returns the
+    full document. `_id` is always included.
+    """
+    if fields is None:
+        names = default_fields
+    elif fields.strip() == "all":
+        names = None
+    else:
+        names = [name.strip() for name in fields.split(",") if name.strip()]
+    
+    if not names:
+        return None
+    
+    for name in names:
+        if not _FIELD_NAME.match(name):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid field name: {name}"
+            )
+    
+    return {name: 1 for name in names}
+
+def book_etag(book_id: str, version: int) -> str:
+    """Weak ETag for a single book, derived from its write version"""
+    return f'W/"{book_id}-{version or 0}"'
+
+def list_etag(items: list, *extra) -> str:
+    """Weak ETag for a list of versioned documents plus any page metadata"""
+    digest = hashlib.sha1()
+    for item in items:
+        digest.update(f"{item.get('id')}:{item.get('version', 0)};".encode())
+    digest.update(repr(extra).encode())
+    return f'W/"{digest.hexdigest()}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header against an ETag (weak comparison)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    
+    def opaque(tag: str) -> str:
+        tag = tag.strip()
+        return tag[2:] if tag.startswith("W/") else tag
+    
+    return opaque(etag) in [opaque(tag) for tag in if_none_match.split(",")]
+
+def http_date(value: datetime) -> str:
+    """Format a naive UTC datetime for Last-Modified headers"""
+    return format_datetime(value.replace(tzinfo=timezone.utc), usegmt=True)
+
+# Sort spec that orders `$text` matches by relevance
+TEXT_SCORE_SORT = [("relevance_score", {"$meta": "textScore"})]
+
+def with_text_score(projection: Optional[dict]) -> dict:
+    """Add the `$text` relevance score to a projection
+
+    A projection holding only the score still returns every other field.
+    """
+    projection = dict(projection or {})
+    projection["relevance_score"] = {"$meta": "textScore"}
+    return projection
+
+def json_default(value):
+    """Serialize datetimes as ISO 8601 and anything else as a string"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
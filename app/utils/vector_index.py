@@ -0,0 +1,219 @@
+from app.cores.database import books_collection
+from app.cores.config import settings
+from app.utils.search_index import tokenize
+from starlette.concurrency import run_in_threadpool
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import numpy as np
+import asyncio
+import json
+import os
+import shutil
+import zlib
+
+# Each field's tokens count this many times towards a book's term frequencies
+VECTOR_FIELDS = {
+    "title": 2,
+    "category": 1,
+    "description": 1
+}
+
+# Rows normalized per step when finishing a build
+NORMALIZE_BLOCK_ROWS = 10000
+
+def hashed_term_vector(text_fields: dict, dimensions: int) -> np.ndarray:
+    """Signed feature-hashed, sublinear term frequencies of a book's text
+    
+    Tokens are hashed with CRC32 rather than `hash()` so every process (and
+    every build) maps a token to the same column.
+    """
+    buckets = []
+    signs = []
+    for field, weight in VECTOR_FIELDS.items():
+        for token in tokenize(text_fields.get(field)):
+            digest = zlib.crc32(token.encode())
+            buckets.append(digest % dimensions)
+            signs.append(weight if digest & 0x80000000 else -weight)
+    
+    counts = np.bincount(np.array(buckets, dtype=np.int64), weights=signs, minlength=dimensions)
+    return (np.sign(counts) * np.log1p(np.abs(counts))).astype(np.float32)
+
+def _vectorize_rows(matrix_path: str, start: int, rows: list) -> np.ndarray:
+    """Write term vectors for a chunk of books into the shared matrix
+    
+    Runs in a worker process; returns the chunk's per-column document counts.
+    """
+    matrix = np.load(matrix_path, mmap_mode="r+")
+    dimensions = matrix.shape[1]
+    document_counts = np.zeros(dimensions, dtype=np.int64)
+    
+    for offset, text_fields in enumerate(rows):
+        vector = hashed_term_vector(text_fields, dimensions)
+        matrix[start + offset] = vector
+        document_counts += vector != 0
+    
+    matrix.flush()
+    return document_counts
+
+def _finish_matrix(matrix_path: str, count: int, document_counts: np.ndarray) -> np.ndarray:
+    """Apply IDF weights and L2-normalize every row in place"""
+    idf = (np.log((1 + count) / (1 + document_counts)) + 1).astype(np.float32)
+    matrix = np.load(matrix_path, mmap_mode="r+")
+    
+    for start in range(0, count, NORMALIZE_BLOCK_ROWS):
+        block = matrix[start:start + NORMALIZE_BLOCK_ROWS] * idf
+        norms = np.linalg.norm(block, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        matrix[start:start + NORMALIZE_BLOCK_ROWS] = block / norms
+    
+    matrix.flush()
+    return idf
+
+async def build_vector_index(workers: int = None) -> dict:
+    """Build the book vector index from the catalog
+    
+    Books are streamed from MongoDB in chunks and vectorized across a process
+    pool straight into a memory-mapped float32 matrix. The finished build is
+    published by atomically replacing the `CURRENT` pointer, so running
+    servers pick it up without seeing a partial index.
+    """
+    directory = settings.VECTOR_INDEX_DIR
+    dimensions = settings.VECTOR_DIMENSIONS
+    chunk_size = settings.VECTOR_BUILD_CHUNK_SIZE
+    workers = workers or os.cpu_count() or 1
+    
+    build = datetime.utcnow().strftime("%Y%m%dT%H%M%S%f")
+    build_dir = os.path.join(directory, build)
+    os.makedirs(build_dir)
+    matrix_path = os.path.join(build_dir, "vectors.npy")
+    
+    # Books added during the scan beyond this count wait for the next build
+    capacity = await books_collection.count_documents({})
+    np.lib.format.open_memmap(matrix_path, mode="w+", dtype=np.float32, shape=(capacity, dimensions)).flush()
+    
+    loop = asyncio.get_running_loop()
+    document_counts = np.zeros(dimensions, dtype=np.int64)
+    book_ids = []
+    pending = set()
+    rows = []
+    
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        async def submit():
+            nonlocal rows
+            if len(pending) >= workers * 2:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    pending.discard(future)
+                    document_counts[:] += future.result()
+            start = len(book_ids) - len(rows)
+            pending.add(loop.run_in_executor(pool, _vectorize_rows, matrix_path, start, rows))
+            rows = []
+        
+        projection = {field: 1 for field in VECTOR_FIELDS}
+        cursor = books_collection.find({}, projection).sort("_id", 1).batch_size(chunk_size)
+        async for book in cursor:
+            if len(book_ids) == capacity:
+                break
+            book_ids.append(str(book.pop("_id")))
+            rows.append(book)
+            if len(rows) == chunk_size:
+                await submit()
+        if rows:
+            await submit()
+        
+        for future in asyncio.as_completed(pending):
+            document_counts += await future
+    
+    count = len(book_ids)
+    idf = await run_in_threadpool(_finish_matrix, matrix_path, count, document_counts)
+    np.save(os.path.join(build_dir, "idf.npy"), idf)
+    np.save(os.path.join(build_dir, "ids.npy"), np.array(book_ids, dtype="U24"))
+    
+    meta = {
+        "build": build,
+        "count": count,
+        "dimensions": dimensions,
+        "fields": VECTOR_FIELDS,
+        "built_at": datetime.utcnow().isoformat()
+    }
+    with open(os.path.join(build_dir, "meta.json"), "w") as handle:
+        json.dump(meta, handle)
+    
+    # Publish the build, then remove older ones
+    pointer = os.path.join(directory, "CURRENT")
+    with open(pointer + ".tmp", "w") as handle:
+        handle.write(build)
+    os.replace(pointer + ".tmp", pointer)
+    
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if name != build and os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+    
+    return meta
+
+class VectorIndex:
+    """Read-only view of the latest published vector index build
+    
+    The matrix is memory-mapped, so the operating system pages it in on
+    demand and shares it between worker processes. A newer build is picked
+    up on the next search after it is published.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.build = None
+        self.meta = None
+        self.matrix = None
+        self.ids = None
+        self.idf = None
+        self._pointer_mtime = None
+
+    def load(self) -> bool:
+        """Load the current build if it changed; False when none exists"""
+        pointer = os.path.join(self.directory, "CURRENT")
+        try:
+            mtime = os.stat(pointer).st_mtime_ns
+        except FileNotFoundError:
+            return self.matrix is not None
+        
+        if mtime != self._pointer_mtime:
+            with open(pointer) as handle:
+                build = handle.read().strip()
+            if build != self.build:
+                build_dir = os.path.join(self.directory, build)
+                with open(os.path.join(build_dir, "meta.json")) as handle:
+                    meta = json.load(handle)
+                self.matrix = np.load(os.path.join(build_dir, "vectors.npy"), mmap_mode="r")[:meta["count"]]
+                self.ids = np.load(os.path.join(build_dir, "ids.npy"))
+                self.idf = np.load(os.path.join(build_dir, "idf.npy"))
+                self.meta = meta
+                self.build = build
+            self._pointer_mtime = mtime
+        return True
+
+    def search(self, query: str, k: int = 20) -> list:
+        """Top `k` `(book_id, cosine similarity)` pairs for a free-text query"""
+        if not self.load() or not len(self.ids):
+            return []
+        
+        vector = hashed_term_vector({"title": query}, self.matrix.shape[1]) * self.idf
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            return []
+        
+        scores = self.matrix @ (vector / norm)
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(str(self.ids[i]), float(scores[i])) for i in top if scores[i] > 0]
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.matrix is not None,
+            "build": self.build,
+            "books": self.meta["count"] if self.meta else 0,
+            "dimensions": self.meta["dimensions"] if self.meta else settings.VECTOR_DIMENSIONS
+        }
+
+vector_index = VectorIndex(settings.VECTOR_INDEX_DIR)
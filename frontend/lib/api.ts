@@ -105,13 +105,15 @@ export const authAPI = {
 
 // Book APIs
 export const bookAPI = {
-    getBooks: async (params?: { page?: number; page_size?: number; category?: string; author?: string; search?: string }) => {
+    getBooks: async (params?: { page?: number; page_size?: number; category?: string; author?: string; search?: string; cursor?: string }) => {
         const queryParams = new URLSearchParams();
         if (params?.page) queryParams.append('page', params.page.toString());
         if (params?.page_size) queryParams.append('page_size', params.page_size.toString());
         if (params?.category) queryParams.append('category', params.category);
         if (params?.author) queryParams.append('author', params.author);
         if (params?.search) queryParams.append('search', params.search);
+        // Keyset paging: pass '' for the first page, then the returned next_cursor
+        if (params?.cursor !== undefined) queryParams.append('cursor', params.cursor);
 
         const url = `/books${queryParams.toString() ? `?${queryParams.toString()}` : ''}`;
         return fetchWithAuth(url);
@@ -153,6 +155,13 @@ export const bookAPI = {
         return fetchWithAuth(`/books/${id}/availability`);
     },
 
+    checkAvailabilityBatch: async (data: { book_ids?: string[]; isbns?: string[] }) => {
+        return fetchWithAuth('/books/availability', {
+            method: 'POST',
+            body: JSON.stringify(data),
+        });
+    },
+
     uploadBook: async (formData: FormData) => {
         const token = getAuthToken();
         const response = await fetch(`${API_BASE_URL}/books/upload`, {
@@ -29,6 +29,10 @@ from app.cores.config import settings
 from app.utils.utils import hash_password
 from motor.motor_asyncio import AsyncIOMotorClient
 from app.controllers.member_controller import generate_membership_id
+from app.utils.facets import facet_changes, apply_facet_changes
+from app.utils.popularity import rebuild_popularity
+from app.utils.member_counters import reconcile_member_counters
+from app.utils.query_compiler import SEARCH_KEYS, BOOK_SEARCH_FIELDS, USER_SEARCH_FIELDS, search_keys
 
 # Create a new database connection for this script
 _client = None
@@ -47,6 +51,7 @@ def get_collections():
     db = get_db_connection()
     return {
         'books': db["books"],
+        'book_facets': db["book_facets"],
         'members': db["members"],
         'users': db["users"],
         'transactions': db["transactions"],
@@ -109,6 +114,7 @@ class ExcelImporter:
         if self.clear_existing:
             print("🗑️  Clearing existing data...")
             await self.collections['books'].delete_many({})
+            await self.collections['book_facets'].delete_many({})
             await self.collections['members'].delete_many({})
             await self.collections['users'].delete_many({})
             await self.collections['transactions'].delete_many({})
@@ -158,6 +164,9 @@ class ExcelImporter:
         if not has_isbn:
             print("⚠️  Warning: No ISBN column found. Books will be imported but may have duplicates.")
         
+        # Facet counter deltas, applied in one bulk write after the loop
+        pending_facets = []
+        
         for idx, row in df.iterrows():
             try:
                 # Get ISBN (prefer isbn_13, then isbn_10, then isbn)
@@ -281,8 +290,10 @@ class ExcelImporter:
                 
                 # Remove None values
                 book_doc = {k: v for k, v in book_doc.items() if v is not None}
+                book_doc[SEARCH_KEYS] = search_keys(book_doc, BOOK_SEARCH_FIELDS)
                 
                 await self.collections['books'].insert_one(book_doc)
+                pending_facets.extend(facet_changes(book_doc))
                 self.stats['books']['imported'] += 1
                 
                 if (idx + 1) % 10 == 0:
@@ -294,6 +305,8 @@ class ExcelImporter:
                 import traceback
                 traceback.print_exc()
         
+        await apply_facet_changes(pending_facets)
+        
         print(f"✅ Books import complete: {self.stats['books']['imported']} imported, {self.stats['books']['errors']} errors")
     
     async def import_users(self, df: pd.DataFrame):
@@ -352,6 +365,7 @@ class ExcelImporter:
                     "is_active": True,
                     "created_at": datetime.now(timezone.utc)
                 }
+                user_doc[SEARCH_KEYS] = search_keys(user_doc, USER_SEARCH_FIELDS)
                 
                 result = await self.collections['users'].insert_one(user_doc)
                 user_id_map[email] = str(result.inserted_id)
@@ -560,6 +574,10 @@ class ExcelImporter:
                 print(f"   ❌ Error importing row {idx + 1}: {str(e)}")
         
         print(f"✅ Transactions import complete: {self.stats['transactions']['imported']} imported, {self.stats['transactions']['errors']} errors")
+        
+        # Popularity and member circulation counters are materialized from transactions
+        await rebuild_popularity()
+        await reconcile_member_counters()
     
     async def auto_detect_and_import(self, sheets: Dict[str, pd.DataFrame]):
         """Auto-detect sheet types and import accordingly"""
@@ -2,6 +2,9 @@ import asyncio
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
 from dotenv import load_dotenv
+from app.cores.config import settings
+from app.utils.facets import rebuild_facets
+from app.utils.popularity import rebuild_popularity
 
 async def test_connection():
     load_dotenv()
@@ -21,18 +24,66 @@ async def test_connection():
         
         # User indexes
         await db.users.create_index("email", unique=True)
+        await db.users.create_index("full_name")
+        await db.users.create_index("search_keys.full_name")
+        await db.users.create_index("search_keys.email")
         print("- User email index created")
         
         # Book indexes
         await db.books.create_index("isbn", unique=True)
-        await db.books.create_index([("title", "text"), ("author", "text"), ("category", "text")])
+        
+        # A collection can only have one text index, so replace it if its fields changed
+        text_fields = [("title", "text"), ("author", "text"), ("category", "text")]
+        text_weights = {"title": 10, "author": 5, "category": 2}
+        if settings.TEXT_INDEX_INCLUDE_DESCRIPTION:
+            text_fields.append(("description", "text"))
+            text_weights["description"] = 1
+        
+        async for index in db.books.list_indexes():
+            if "textIndexVersion" in index and index["name"] != "books_text":
+                await db.books.drop_index(index["name"])
+            elif index["name"] == "books_text" and set(index["weights"]) != set(text_weights):
+                await db.books.drop_index(index["name"])
+        await db.books.create_index(text_fields, name="books_text", weights=text_weights)
+        # Fuzzy search resolves similar titles/authors to exact-match $in lookups
+        await db.books.create_index("title")
+        await db.books.create_index("author")
+        
+        # Backfill lowercase shadow fields used by prefix searches
+        await db.books.update_many({}, [{"$set": {"search_keys": {
+            "title": {"$toLower": "$title"},
+            "author": {"$toLower": "$author"},
+            "category": {"$toLower": "$category"}
+        }}}])
+        await db.users.update_many({}, [{"$set": {"search_keys": {
+            "full_name": {"$toLower": "$full_name"},
+            "email": {"$toLower": "$email"}
+        }}}])
+        for field in ["title", "author", "category"]:
+            await db.books.create_index(f"search_keys.{field}")
+        await db.book_facets.create_index([("type", 1), ("value", 1)], unique=True)
+        await db.book_facets.create_index([("type", 1), ("value_lower", 1)])
         print("- Book indexes created")
         
+        # Backfill category/author counters; later writes keep them up to date incrementally
+        print(f"- {await rebuild_facets()} book facets rebuilt")
+        
         # Transaction indexes
         await db.transactions.create_index("member_id")
         await db.transactions.create_index("book_id")
+        await db.transactions.create_index([("book_id", 1), ("status", 1), ("borrow_date", 1)])
+        await db.transactions.create_index([("status", 1), ("due_date", 1), ("_id", 1)])
+        
+        # Popularity counters; daily buckets expire once outside every ranking window
+        await db.book_popularity.create_index([("borrow_count", -1)])
+        await db.book_popularity_daily.create_index([("day", 1), ("book_id", 1)], unique=True)
+        await db.book_popularity_daily.create_index("day", expireAfterSeconds=35 * 24 * 3600, name="day_ttl")
         print("- Transaction indexes created")
         
+        # Backfill popularity counters from loan history; borrows keep them up to date afterwards
+        popularity = await rebuild_popularity()
+        print(f"- Popularity counters rebuilt ({popularity['books']} books, {popularity['daily_buckets']} daily buckets)")
+        
         print("Database initialized successfully!")
         
     except Exception as e:
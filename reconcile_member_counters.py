@@ -0,0 +1,39 @@
+"""
+Member Counter Reconciliation for Library Management System
+
+Rebuilds each member's `current_borrowed` and `pending_fine_total` counters
+from the transactions and fines collections and reports any drift. Run it
+once after upgrading (to backfill existing members) and then periodically,
+e.g. nightly from cron, while circulation is quiet.
+
+Usage:
+    python reconcile_member_counters.py [--report-only]
+"""
+
+import asyncio
+import argparse
+import sys
+from pathlib import Path
+
+# Add app directory to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.utils.member_counters import reconcile_member_counters
+
+async def main(fix: bool = True):
+    print("Reconciling member counters..." if fix else "Checking member counters...")
+    
+    report = await reconcile_member_counters(fix)
+    
+    print(f"- {report['members_scanned']} members scanned")
+    print(f"- {report['missing_counters']} without counters, {report['drifted']} drifted")
+    for drift in report["drift_sample"]:
+        print(f"  {drift['member_id']}: stored {drift['stored']}, expected {drift['expected']}")
+    if fix:
+        print(f"- {report['fixed']} members updated")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild and check per-member circulation counters")
+    parser.add_argument("--report-only", action="store_true", help="Report drift without fixing it")
+    args = parser.parse_args()
+    asyncio.run(main(not args.report_only))
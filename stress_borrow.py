@@ -0,0 +1,73 @@
+import argparse
+import asyncio
+from datetime import datetime, timedelta
+from app.cores.database import (
+    books_collection, members_collection, transactions_collection,
+    book_popularity_collection, book_popularity_daily_collection
+)
+from app.controllers.transaction_controller import borrow_book
+from app.schemas.transaction_schema import BorrowRequest
+from fastapi import HTTPException
+
+# Concurrency stress test for the borrow path: many members race for the
+# few copies of one book. The book has no author or category so the
+# facet counters are left alone. Run against a disposable database, e.g.
+#   python stress_borrow.py --borrowers 500 --copies 7
+
+async def stress_borrow(borrowers: int, copies: int):
+    marker = f"stress-{datetime.utcnow().timestamp()}"
+    book = await books_collection.insert_one({
+        "title": f"Stress Test Book {marker}",
+        "isbn": marker,
+        "total_copies": copies,
+        "available_copies": copies,
+        "version": 1
+    })
+    book_id = str(book.inserted_id)
+    
+    members = await members_collection.insert_many([
+        {
+            "membership_id": f"{marker}-{i}",
+            "is_active": True,
+            "max_books_allowed": 5,
+            "membership_end": datetime.utcnow() + timedelta(days=30)
+        }
+        for i in range(borrowers)
+    ])
+    member_ids = [str(member_id) for member_id in members.inserted_ids]
+    
+    try:
+        results = await asyncio.gather(
+            *(borrow_book(BorrowRequest(member_id=member_id, book_id=book_id)) for member_id in member_ids),
+            return_exceptions=True
+        )
+        
+        succeeded = sum(1 for result in results if isinstance(result, dict))
+        rejected = sum(1 for result in results if isinstance(result, HTTPException))
+        errors = [result for result in results if not isinstance(result, (dict, HTTPException))]
+        available = (await books_collection.find_one({"_id": book.inserted_id}))["available_copies"]
+        loans = await transactions_collection.count_documents({"book_id": book_id, "status": "borrowed"})
+        
+        print(f"Borrowers: {borrowers}, copies: {copies}")
+        print(f"Succeeded: {succeeded}, rejected: {rejected}, errors: {len(errors)}")
+        print(f"Available copies left: {available}, open loans: {loans}")
+        for error in errors[:5]:
+            print(f"Error: {error!r}")
+        
+        assert available >= 0, "available_copies went negative"
+        assert succeeded == loans == min(copies, borrowers), "loans do not match the copies handed out"
+        assert available + loans == copies, "copies were lost or duplicated"
+        print("OK")
+    finally:
+        await transactions_collection.delete_many({"book_id": book_id})
+        await members_collection.delete_many({"_id": {"$in": members.inserted_ids}})
+        await books_collection.delete_one({"_id": book.inserted_id})
+        await book_popularity_collection.delete_one({"_id": book_id})
+        await book_popularity_daily_collection.delete_many({"book_id": book_id})
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hammer one book with simultaneous borrows")
+    parser.add_argument("--borrowers", type=int, default=300)
+    parser.add_argument("--copies", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(stress_borrow(args.borrowers, args.copies))